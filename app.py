@@ -13,15 +13,19 @@ Funkcje:
 
 import os
 import csv
+import hashlib
 import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 from functools import wraps
 
 from flask import (
     Flask, request, jsonify, session, send_from_directory,
-    make_response
+    make_response, Response, stream_with_context
 )
 
+import orjson
+
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
@@ -37,6 +41,12 @@ ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "pdf", "webp"}
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Skrypt aplikacji leży w static/app.js; hash treści liczymy raz przy
+# starcie i wstawiamy do nazwy pliku w powłoce HTML (cache-busting)
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+with open(os.path.join(_STATIC_DIR, "app.js"), "rb") as _f:
+    APP_JS_VER = hashlib.md5(_f.read()).hexdigest()[:12]
+
 app = Flask(__name__)
 app.config.update(
     SECRET_KEY=os.environ.get("EDZIENNIK_SECRET", "dev-secret-change-me"),
@@ -63,6 +73,10 @@ else:
         ENGINE = create_engine(
             _normalize_db_url(DB_URL),
             pool_pre_ping=True,
+            # /api/stats wypuszcza kilka zapytań równolegle — pula musi
+            # pomieścić kilka jednoczesnych połączeń na request
+            pool_size=10,
+            max_overflow=10,
             connect_args={"sslmode": "require"},
         )
         # test szybki
@@ -188,16 +202,150 @@ CREATE TABLE IF NOT EXISTS trips (
     notes           TEXT,
     created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
+
+-- Zmaterializowane liczniki TCO per użytkownik (utrzymywane triggerami),
+-- żeby /api/stats nie skanował całej historii przy każdym wywołaniu
+CREATE TABLE IF NOT EXISTS user_totals (
+    owner_id            BIGINT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    service_sum         NUMERIC NOT NULL DEFAULT 0,
+    fuel_sum            NUMERIC NOT NULL DEFAULT 0,
+    first_service_date  DATE,
+    min_mileage         INTEGER,
+    max_mileage         INTEGER
+);
+
+CREATE OR REPLACE FUNCTION recompute_user_totals(p_owner BIGINT) RETURNS VOID AS $fn$
+BEGIN
+    INSERT INTO user_totals (owner_id, service_sum, fuel_sum, first_service_date, min_mileage, max_mileage)
+    SELECT p_owner,
+           COALESCE((SELECT SUM(e.cost) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=p_owner), 0),
+           COALESCE((SELECT SUM(f.total_cost) FROM fuel_logs f JOIN vehicles v ON v.id=f.vehicle_id WHERE v.owner_id=p_owner), 0),
+           (SELECT MIN(e.date) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=p_owner),
+           (SELECT MIN(e.mileage) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=p_owner AND e.mileage IS NOT NULL),
+           (SELECT MAX(e.mileage) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=p_owner AND e.mileage IS NOT NULL)
+    ON CONFLICT (owner_id) DO UPDATE SET
+        service_sum = EXCLUDED.service_sum,
+        fuel_sum = EXCLUDED.fuel_sum,
+        first_service_date = EXCLUDED.first_service_date,
+        min_mileage = EXCLUDED.min_mileage,
+        max_mileage = EXCLUDED.max_mileage;
+END;
+$fn$ LANGUAGE plpgsql;
+
+-- INSERT domyka liczniki przyrostowo; UPDATE/DELETE (rzadkie) przeliczają od zera
+CREATE OR REPLACE FUNCTION bump_user_totals_service() RETURNS TRIGGER AS $fn$
+DECLARE v_owner BIGINT;
+BEGIN
+    SELECT owner_id INTO v_owner FROM vehicles WHERE id = COALESCE(NEW.vehicle_id, OLD.vehicle_id);
+    IF v_owner IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_totals AS t (owner_id, service_sum, first_service_date, min_mileage, max_mileage)
+        VALUES (v_owner, COALESCE(NEW.cost, 0), NEW.date, NEW.mileage, NEW.mileage)
+        ON CONFLICT (owner_id) DO UPDATE SET
+            service_sum = t.service_sum + COALESCE(NEW.cost, 0),
+            first_service_date = LEAST(t.first_service_date, NEW.date),
+            min_mileage = LEAST(t.min_mileage, NEW.mileage),
+            max_mileage = GREATEST(t.max_mileage, NEW.mileage);
+    ELSE
+        PERFORM recompute_user_totals(v_owner);
+    END IF;
+    RETURN NULL;
+END;
+$fn$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bump_user_totals_fuel() RETURNS TRIGGER AS $fn$
+DECLARE v_owner BIGINT;
+BEGIN
+    v_owner := COALESCE(NEW.user_id, OLD.user_id);
+    IF v_owner IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_totals AS t (owner_id, fuel_sum)
+        VALUES (v_owner, COALESCE(NEW.total_cost, 0))
+        ON CONFLICT (owner_id) DO UPDATE SET
+            fuel_sum = t.fuel_sum + COALESCE(NEW.total_cost, 0);
+    ELSE
+        PERFORM recompute_user_totals(v_owner);
+    END IF;
+    RETURN NULL;
+END;
+$fn$ LANGUAGE plpgsql;
+
+-- usunięcie pojazdu kaskadowo czyści wpisy — przelicz liczniki właściciela
+CREATE OR REPLACE FUNCTION recompute_user_totals_vehicle() RETURNS TRIGGER AS $fn$
+BEGIN
+    PERFORM recompute_user_totals(OLD.owner_id);
+    RETURN NULL;
+END;
+$fn$ LANGUAGE plpgsql;
+
+-- triggery zakładamy tylko, gdy ich brak — DROP+CREATE bierze
+-- ACCESS EXCLUSIVE na najgorętszych tabelach przy każdym przebiegu
+DO $do$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname='t_user_totals_service' AND tgrelid='service_entries'::regclass) THEN
+        CREATE TRIGGER t_user_totals_service
+        AFTER INSERT OR UPDATE OR DELETE ON service_entries
+        FOR EACH ROW EXECUTE FUNCTION bump_user_totals_service();
+    END IF;
+END
+$do$;
+
+DO $do$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname='t_user_totals_fuel' AND tgrelid='fuel_logs'::regclass) THEN
+        CREATE TRIGGER t_user_totals_fuel
+        AFTER INSERT OR UPDATE OR DELETE ON fuel_logs
+        FOR EACH ROW EXECUTE FUNCTION bump_user_totals_fuel();
+    END IF;
+END
+$do$;
+
+DO $do$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname='t_user_totals_vehicle' AND tgrelid='vehicles'::regclass) THEN
+        CREATE TRIGGER t_user_totals_vehicle
+        AFTER DELETE ON vehicles
+        FOR EACH ROW EXECUTE FUNCTION recompute_user_totals_vehicle();
+    END IF;
+END
+$do$;
+
+-- backfill tylko dla użytkowników, którzy nie mają jeszcze wiersza
+SELECT recompute_user_totals(u.id)
+FROM users u
+WHERE NOT EXISTS (SELECT 1 FROM user_totals t WHERE t.owner_id = u.id);
 """
 
 
+# migracja biegnie raz na proces — /api/health woła init_db przy każdej
+# sondzie, a DDL nie ma czego robić po pierwszym udanym przebiegu
+_schema_ready = False
+
+
 def init_db():
+    global _schema_ready
+    if _schema_ready:
+        return
     require_db()
     with ENGINE.begin() as conn:
         for stmt in DDL.strip().split(";\n\n"):
             s = stmt.strip()
             if s:
                 conn.execute(text(s))
+    _schema_ready = True
+
+
+# schemat stawiamy od razu przy starcie — /api/stats zależy od user_totals
+# i nie może czekać na pierwszy strzał w /api/health po deployu
+if ENGINE is not None:
+    try:
+        init_db()
+    except Exception as e:
+        print("[DB] Inicjalizacja schematu nie powiodła się:", e)
 
 
 @app.get("/api/health")
@@ -495,13 +643,22 @@ def list_reminders():
             .mappings()
             .all()
         )
-    # flag is_due (prosta flaga)
+    # flag is_due (prosta flaga) + pola gotowe do wyświetlenia — klient
+    # tylko skleja wiersze, bez formatowania dat/ikon per przerysowanie
     res = []
+    today = date.today()
     for r in rows:
-        is_due = False
-        if r["due_date"]:
-            is_due = date.fromisoformat(str(r["due_date"])) <= date.today()
-        res.append({**dict(r), "is_due": is_due})
+        due = date.fromisoformat(str(r["due_date"])) if r["due_date"] else None
+        is_due = due is not None and due <= today
+        res.append(
+            {
+                **dict(r),
+                "is_due": is_due,
+                "due_display": due.strftime("%d.%m.%Y") if due else "",
+                "due_icon": "🔔" if is_due else "",
+                "notify_text": "tak" if r["notify_email"] else "nie",
+            }
+        )
     return jsonify(res)
 
 
@@ -986,6 +1143,70 @@ def delete_trip(tid):
 
 
 # --- Statystyki / TCO ---
+
+
+def _stats_row(sql, params):
+    """Jeden wiersz na własnym połączeniu z puli (równoległy blok w /api/stats)."""
+    with ENGINE.connect() as conn:
+        conn.exec_driver_sql("SET LOCAL jit = off")
+        conn.exec_driver_sql("SET LOCAL statement_timeout = '5s'")
+        return conn.execute(text(sql), params).mappings().first()
+
+
+def _stats_rows(sql, params):
+    """Lista wierszy na własnym połączeniu z puli (równoległy blok w /api/stats)."""
+    with ENGINE.connect() as conn:
+        conn.exec_driver_sql("SET LOCAL jit = off")
+        conn.exec_driver_sql("SET LOCAL statement_timeout = '5s'")
+        return conn.execute(text(sql), params).mappings().all()
+
+
+def _stats_rows_driver(sql, params):
+    """Jak _stats_rows, ale przez exec_driver_sql — omija przepisywanie
+    bind-paramów i opakowanie RowMapping; wiersze wracają jako krotki.
+    Placeholdery w stylu psycopg2: %(nazwa)s."""
+    with ENGINE.connect() as conn:
+        conn.exec_driver_sql("SET LOCAL jit = off")
+        conn.exec_driver_sql("SET LOCAL statement_timeout = '5s'")
+        return conn.exec_driver_sql(sql, params).fetchall()
+
+
+# dzienne koszty per auto (serwis + paliwo, rozbite) — strumieniowane
+# server-side cursorem przez exec_driver_sql (placeholdery psycopg2),
+# więc SQL trzymamy w stałej zamiast inline
+Q_DAILY_ROWS = (
+    """
+    SELECT d::text AS ymd,
+           vehicle_id,
+           label,
+           SUM(service_cost) AS service_cost,
+           SUM(fuel_cost) AS fuel_cost,
+           SUM(service_cost + fuel_cost) AS total_cost
+    FROM (
+        SELECT e.date AS d,
+               v.id AS vehicle_id,
+               (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
+               COALESCE(e.cost,0) AS service_cost,
+               0::numeric AS fuel_cost
+        FROM service_entries e
+        JOIN vehicles v ON v.id=e.vehicle_id
+        WHERE v.owner_id=%(uid)s
+        UNION ALL
+        SELECT f.date AS d,
+               v.id AS vehicle_id,
+               (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
+               0::numeric AS service_cost,
+               COALESCE(f.total_cost,0) AS fuel_cost
+        FROM fuel_logs f
+        JOIN vehicles v ON v.id=f.vehicle_id
+        WHERE v.owner_id=%(uid)s
+    ) s
+    GROUP BY ymd, vehicle_id, label
+    ORDER BY ymd, label
+    """
+)
+
+
 @app.get("/api/stats")
 @login_required
 def stats():
@@ -999,176 +1220,87 @@ def stats():
     """
     require_db()
     uid = session["user_id"]
-    with ENGINE.begin() as conn:
-        # koszty dziennie serwis
-        by_day_service = (
-            conn.execute(
-                text(
-                    "SELECT TO_CHAR(date,'YYYY-MM-DD') AS ymd, COALESCE(SUM(cost),0) AS total_cost "
-                    "FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id "
-                    "WHERE v.owner_id=:uid GROUP BY 1 ORDER BY 1"
-                ),
-                {"uid": uid},
-            )
-            .mappings()
-            .all()
-        )
 
+    # Liczniki TCO utrzymują triggery w user_totals — jeden odczyt po
+    # kluczu głównym zamiast pięciu skanów agregujących; pozostałe
+    # zapytania wierszowe są od siebie niezależne, więc idą równolegle
+    # na osobnych połączeniach z puli
+    row_sql = {
+        # koszty dziennie serwis (bez ORDER BY — i tak scalamy w dict
+        # i sortujemy raz po połączeniu)
+        "by_day_service": (
+            "SELECT date::text AS ymd, COALESCE(SUM(cost),0) AS total_cost "
+            "FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id "
+            "WHERE v.owner_id=:uid GROUP BY 1"
+        ),
         # koszty dziennie paliwo
-        by_day_fuel = (
-            conn.execute(
-                text(
-                    "SELECT TO_CHAR(date,'YYYY-MM-DD') AS ymd, COALESCE(SUM(total_cost),0) AS total_cost "
-                    "FROM fuel_logs f JOIN vehicles v ON v.id=f.vehicle_id "
-                    "WHERE v.owner_id=:uid GROUP BY 1 ORDER BY 1"
-                ),
-                {"uid": uid},
-            )
-            .mappings()
-            .all()
-        )
-
-        # ostatnie przebiegi per pojazd
-        last_mileage = (
-            conn.execute(
-                text(
-                    "SELECT v.id AS vehicle_id, (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label, "
-                    "COALESCE(MAX(e.mileage),0) AS mileage "
-                    "FROM vehicles v LEFT JOIN service_entries e ON e.vehicle_id=v.id "
-                    "WHERE v.owner_id=:uid GROUP BY v.id, label ORDER BY label ASC"
-                ),
-                {"uid": uid},
-            )
-            .mappings()
-            .all()
-        )
-
-        # TCO: suma kosztów serwis + paliwo
-        total_service_cost = (
-            conn.execute(
-                text(
-                    "SELECT COALESCE(SUM(cost),0) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=:uid"
-                ),
-                {"uid": uid},
-            ).scalar()
-            or 0
-        )
-        total_fuel_cost = (
-            conn.execute(
-                text(
-                    "SELECT COALESCE(SUM(total_cost),0) FROM fuel_logs f JOIN vehicles v ON v.id=f.vehicle_id WHERE v.owner_id=:uid"
-                ),
-                {"uid": uid},
-            ).scalar()
-            or 0
-        )
-        total_cost = float(total_service_cost) + float(total_fuel_cost)
-
-        mi = (
-            conn.execute(
-                text(
-                    "SELECT MIN(date) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=:uid"
-                ),
-                {"uid": uid},
-            ).scalar()
-        )
-
-        # km: różnica max-min mileage na poziomie całej floty
-        min_mil = (
-            conn.execute(
-                text(
-                    "SELECT COALESCE(MIN(mileage),0) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=:uid AND mileage IS NOT NULL"
-                ),
-                {"uid": uid},
-            ).scalar()
-            or 0
+        "by_day_fuel": (
+            "SELECT date::text AS ymd, COALESCE(SUM(total_cost),0) AS total_cost "
+            "FROM fuel_logs f JOIN vehicles v ON v.id=f.vehicle_id "
+            "WHERE v.owner_id=:uid GROUP BY 1"
+        ),
+        # ostatnie przebiegi per pojazd (sort po label robimy w Pythonie)
+        "last_mileage": (
+            "SELECT v.id AS vehicle_id, (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label, "
+            "COALESCE(MAX(e.mileage),0) AS mileage "
+            "FROM vehicles v LEFT JOIN service_entries e ON e.vehicle_id=v.id "
+            "WHERE v.owner_id=:uid GROUP BY v.id, label"
+        ),
+    }
+    # SZCZEGÓŁOWE tankowania — do liczenia spalania na podstawie pełnych
+    # baków; gorąca ścieżka, więc idzie przez exec_driver_sql (krotki)
+    fuel_detail_sql = """
+        SELECT
+            v.id AS vehicle_id,
+            (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
+            f.date,
+            f.odometer,
+            f.liters,
+            f.full_tank
+        FROM fuel_logs f
+        JOIN vehicles v ON v.id = f.vehicle_id
+        WHERE v.owner_id = %(uid)s
+          AND f.odometer IS NOT NULL   -- bez przebiegu nie liczymy
+        ORDER BY v.id, f.date, f.id
+    """
+    with ThreadPoolExecutor(max_workers=len(row_sql) + 2) as pool:
+        row_futures = {
+            name: pool.submit(_stats_rows, sql, {"uid": uid})
+            for name, sql in row_sql.items()
+        }
+        fuel_detail_future = pool.submit(
+            _stats_rows_driver, fuel_detail_sql, {"uid": uid}
         )
-        max_mil = (
-            conn.execute(
-                text(
-                    "SELECT COALESCE(MAX(mileage),0) FROM service_entries e JOIN vehicles v ON v.id=e.vehicle_id WHERE v.owner_id=:uid AND mileage IS NOT NULL"
-                ),
-                {"uid": uid},
-            ).scalar()
-            or 0
+        # miesiące eksploatacji i km liczymy od razu w SQL — bez
+        # wyciągania trzech skalarów i parsowania dat w Pythonie
+        totals_future = pool.submit(
+            _stats_row,
+            "SELECT service_sum::float8 AS service_sum, fuel_sum::float8 AS fuel_sum, "
+            "CASE WHEN first_service_date IS NULL THEN 0 "
+            "ELSE GREATEST(1, (EXTRACT(YEAR FROM age(CURRENT_DATE, first_service_date))*12 "
+            "+ EXTRACT(MONTH FROM age(CURRENT_DATE, first_service_date)))::int) END AS months, "
+            "GREATEST(COALESCE(max_mileage - min_mileage, 0), 0) AS km "
+            "FROM user_totals WHERE owner_id=:uid",
+            {"uid": uid},
         )
-        km = max(0, (max_mil - min_mil))
 
-        # SZCZEGÓŁOWE tankowania — do liczenia spalania na podstawie pełnych baków
-        fuel_detail_rows = (
-            conn.execute(
-                text(
-                    """
-                    SELECT
-                        v.id AS vehicle_id,
-                        (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
-                        f.date,
-                        f.odometer,
-                        f.liters,
-                        f.full_tank
-                    FROM fuel_logs f
-                    JOIN vehicles v ON v.id = f.vehicle_id
-                    WHERE v.owner_id = :uid
-                      AND f.odometer IS NOT NULL   -- bez przebiegu nie liczymy
-                    ORDER BY v.id, f.date, f.id
-                    """
-                ),
-                {"uid": uid},
-            )
-            .mappings()
-            .all()
-        )
+    by_day_service = row_futures["by_day_service"].result()
+    by_day_fuel = row_futures["by_day_fuel"].result()
+    last_mileage = sorted(
+        row_futures["last_mileage"].result(), key=lambda r: r["label"] or ""
+    )
+    fuel_detail_rows = fuel_detail_future.result()
 
-        # dzienne koszty per auto (serwis + paliwo, rozbite)
-        daily_rows = (
-            conn.execute(
-                text(
-                    """
-            SELECT TO_CHAR(d,'YYYY-MM-DD') AS ymd,
-                   vehicle_id,
-                   label,
-                   SUM(service_cost) AS service_cost,
-                   SUM(fuel_cost) AS fuel_cost,
-                   SUM(service_cost + fuel_cost) AS total_cost
-            FROM (
-                SELECT e.date AS d,
-                       v.id AS vehicle_id,
-                       (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
-                       COALESCE(e.cost,0) AS service_cost,
-                       0::numeric AS fuel_cost
-                FROM service_entries e
-                JOIN vehicles v ON v.id=e.vehicle_id
-                WHERE v.owner_id=:uid
-                UNION ALL
-                SELECT f.date AS d,
-                       v.id AS vehicle_id,
-                       (v.make || ' ' || v.model || ' ' || COALESCE(v.reg_plate,'')) AS label,
-                       0::numeric AS service_cost,
-                       COALESCE(f.total_cost,0) AS fuel_cost
-                FROM fuel_logs f
-                JOIN vehicles v ON v.id=f.vehicle_id
-                WHERE v.owner_id=:uid
-            ) s
-            GROUP BY ymd, vehicle_id, label
-            ORDER BY ymd, label
-            """
-                ),
-                {"uid": uid},
-            )
-            .mappings()
-            .all()
-        )
+    # użytkownik bez wpisów może nie mieć jeszcze wiersza w user_totals
+    totals = totals_future.result()
+    total_service_cost = (totals["service_sum"] if totals else None) or 0.0
+    total_fuel_cost = (totals["fuel_sum"] if totals else None) or 0.0
+    total_cost = total_service_cost + total_fuel_cost
+    months = int(totals["months"]) if totals else 0
+    km = int(totals["km"]) if totals else 0
 
-    # czas eksploatacji w miesiącach (do TCO / miesiąc)
-    months = 0
-    if mi:
-        d0 = mi if isinstance(mi, date) else date.fromisoformat(str(mi))
-        months = max(
-            1, (date.today().year - d0.year) * 12 + (date.today().month - d0.month)
-        )
-
-    cost_per_km = float(total_cost) / km if km > 0 else None
-    cost_per_month = float(total_cost) / months if months > 0 else None
+    cost_per_km = total_cost / km if km > 0 else None
+    cost_per_month = total_cost / months if months > 0 else None
 
     # ====== NOWE liczenie średniego spalania ======
     # Metoda: tylko odcinki między dwoma pełnymi bakami,
@@ -1201,21 +1333,18 @@ def stats():
             }
         )
 
-    for row in fuel_detail_rows:
-        vid = row["vehicle_id"]
-        label = row["label"]
-        odo = row["odometer"]
+    for vid, label, _fdate, odo, liters, full in fuel_detail_rows:
         try:
             odo = int(odo) if odo is not None else None
         except Exception:
             odo = None
 
         try:
-            liters = float(row["liters"] or 0)
+            liters = float(liters or 0)
         except Exception:
             liters = 0.0
 
-        full = bool(row["full_tank"])
+        full = bool(full)
 
         # Zmiana pojazdu – zafinalizuj poprzedni
         if current_vehicle_id is None:
@@ -1263,21 +1392,41 @@ def stats():
         {"ymd": k, "total_cost": v} for k, v in sorted(by_day_map.items())
     ]
 
-    return jsonify(
-        {
-            "by_day": by_day_combined,
-            "last_mileage": [dict(r) for r in last_mileage],
-            "tco": {
-                "total_cost": float(total_cost),
-                "months": months,
-                "km": km,
-                "cost_per_km": cost_per_km,
-                "cost_per_month": cost_per_month,
-            },
-            "fuel_stats": fuel_stats,
-            "daily_vehicle_costs": [dict(r) for r in daily_rows],
-        }
-    )
+    payload = {
+        "by_day": by_day_combined,
+        "last_mileage": [dict(r) for r in last_mileage],
+        "tco": {
+            "total_cost": total_cost,
+            "months": months,
+            "km": km,
+            "cost_per_km": cost_per_km,
+            "cost_per_month": cost_per_month,
+        },
+        "fuel_stats": fuel_stats,
+    }
+
+    # daily_vehicle_costs potrafi mieć pojazdy × dni wierszy — zamiast
+    # materializować listę w pamięci, strumieniujemy server-side cursorem
+    # (stream_results + yield_per) prosto do odpowiedzi JSON.
+    def generate():
+        # orjson jest kilkukrotnie szybszy od flaskowego json na payloadzie
+        # zdominowanym przez floaty i krótkie stringi; Decimal/date → str
+        head = orjson.dumps(payload, default=str)
+        yield head[:-1] + b', "daily_vehicle_costs": ['
+        with ENGINE.connect() as sconn:
+            sconn.exec_driver_sql("SET LOCAL jit = off")
+            result = sconn.execution_options(
+                stream_results=True, yield_per=1000
+            ).exec_driver_sql(Q_DAILY_ROWS, {"uid": uid})
+            keys = list(result.keys())
+            first = True
+            for row in result:
+                chunk = orjson.dumps(dict(zip(keys, row)), default=str)
+                yield chunk if first else b"," + chunk
+                first = False
+        yield b"]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 # --- FRONTEND (INDEX_HTML) ---#
 
 INDEX_HTML = """
@@ -1291,6 +1440,15 @@ INDEX_HTML = """
 
   <script>
     async function api(path, opts = {}) {
+      // opts.json: zwykły obiekt — stringify + nagłówek robimy tu raz,
+      // zamiast powtarzać je przy każdej mutacji
+      if (opts.json !== undefined) {
+        const { json, ...rest } = opts;
+        opts = Object.assign(rest, {
+          body: JSON.stringify(json),
+          headers: Object.assign({ 'Content-Type': 'application/json' }, rest.headers)
+        });
+      }
       const res = await fetch(path, Object.assign({ headers: {} }, opts));
       const ct = res.headers.get('content-type') || '';
       let data = null;
@@ -1544,7 +1702,7 @@ INDEX_HTML = """
       <div style="margin-top:10px;"><button type="button" class="primary" onclick="addEntry()">Dodaj wpis</button></div>
 
       <div style="margin-top:16px; display:flex; gap:8px; align-items:center; flex-wrap:wrap;">
-        <input id="search" placeholder="Szukaj w typie/opisie" oninput="refreshEntries()" style="max-width:360px;">
+        <input id="search" placeholder="Szukaj w typie/opisie" oninput="searchChanged()" style="max-width:360px;">
         <span class="muted" style="font-size:12px;">Kliknij link w kolumnie „Plik”, aby podejrzeć załącznik.</span>
       </div>
 
@@ -1765,789 +1923,30 @@ INDEX_HTML = """
 
   <div class="toast" id="toast">✓ Zapisano</div>
 
-  <script>
-    const $ = (id) => document.getElementById(id);
-    window.loggedIn = false;
-    window._entriesCache = [];
-    window._dailyVehicleCosts = [];
-    let currentUserName = '';
-
-    // ====== Kolory pojazdów ======
-    const VEHICLE_COLOR_PALETTE = [
-      '#ef4444', '#f97316', '#eab308', '#22c55e', '#14b8a6',
-      '#0ea5e9', '#6366f1', '#a855f7', '#ec4899', '#f97373',
-      '#fb923c', '#84cc16', '#22c55e', '#2dd4bf', '#38bdf8',
-      '#818cf8', '#a855f7', '#d946ef', '#f97373', '#f59e0b'
-    ];
-    const VEHICLE_COLORS = {};
-
-    function getVehicleColor(vid) {
-      if (vid === null || vid === undefined) return '#9ca3af';
-      const key = String(vid);
-      if (!VEHICLE_COLORS[key]) {
-        const used = Object.keys(VEHICLE_COLORS).length;
-        const idx = used % VEHICLE_COLOR_PALETTE.length;
-        VEHICLE_COLORS[key] = VEHICLE_COLOR_PALETTE[idx];
-      }
-      return VEHICLE_COLORS[key];
-    }
-
-    // ====== Daty / godziny po polsku ======
-    function formatDatePl(value) {
-      if (!value) return '';
-    
-      const s = String(value).trim();
-    
-      // Spróbuj potraktować to jako datę JS
-      const d = new Date(s);
-      if (!isNaN(d.getTime())) {
-        const dd = String(d.getDate()).padStart(2, '0');
-        const mm = String(d.getMonth() + 1).padStart(2, '0');
-        const yyyy = d.getFullYear();
-        return dd + '.' + mm + '.' + yyyy; // DD.MM.RRRR
-      }
-    
-      // Fallback: tekst w formacie YYYY-MM-DD
-      if (s.length >= 10 && s[4] === '-' && s[7] === '-') {
-        const yyyy = s.slice(0, 4);
-        const mm = s.slice(5, 7);
-        const dd = s.slice(8, 10);
-        return dd + '.' + mm + '.' + yyyy;
-      }
-    
-      return s;
-    }
-    
-    function formatTimeHm(value) {
-      if (!value) return '';
-      const s = String(value);
-      return s.slice(0, 5); // HH:MM
-    }
-
-    function onlyDate(value) {
-      if (!value) return '';
-      const s = String(value);
-      if (s.length >= 10) return s.slice(0, 10);
-      return s;
-    }
-
-    function pad2(n){ return n < 10 ? '0' + n : String(n); }
-
-    // ====== Modale ======
-    function openAuthModal(){ $('authModal').style.display = 'flex'; }
-    function closeAuthModal(){ $('authModal').style.display = 'none'; }
-    function openReminders(){ $('remindersModal').style.display = 'flex'; loadReminders(); loadReminderVehicles(); }
-    function closeReminders(){ $('remindersModal').style.display = 'none'; }
-    function openSchedules(){ $('schedulesModal').style.display = 'flex'; loadSchedules(); }
-    function closeSchedules(){ $('schedulesModal').style.display = 'none'; }
-    function backdropClose(e){ if(e.target.classList.contains('modal-backdrop')) e.target.style.display='none'; }
-
-    // ====== Marka / model / rok / nr rejestracyjny ======
-    const CAR_DATA = {
-      "Audi": ["A1","A3","S3","RS3","A4","S4","RS4","A5","S5","RS5","A6","S6","RS6","A7","S7","RS7","A8","Q2","Q3","RSQ3","Q5","SQ5","Q7","SQ7","Q8","SQ8","RSQ8","TT","TTS","TTRS","e-tron","e-tron GT","RS e-tron GT"],
-      "BMW": ["1 Series","M135i","2 Series","M240i","3 Series","M3","4 Series","M4","5 Series","M5","7 Series","X1","X3","X3 M","X5","X5 M","X6","X6 M","X7","i3","i4","i5","i7","iX"],
-      "Mercedes-Benz": ["A-Class","AMG A35","AMG A45","C-Class","AMG C43","AMG C63","E-Class","AMG E53","AMG E63","S-Class","GLA","GLB","GLC","AMG GLC 43","GLE","GLS","CLA","AMG CLA 45","CLS","EQA","EQB","EQE","EQS"],
-      "Volkswagen": ["up!","Polo","Polo GTI","Golf","Golf GTI","Golf R","Passat","Arteon","Tiguan","T-Roc","T-Roc R","Touareg","ID.3","ID.4","ID.5"],
-      "Škoda": ["Fabia","Scala","Octavia","Octavia RS","Superb","Kamiq","Karoq","Kodiaq","Enyaq"],
-      "SEAT": ["Ibiza","Arona","Leon","Leon Cupra","Ateca","Tarraco"],
-      "Cupra": ["Born","Formentor","Ateca","Leon"],
-      "Renault": ["Clio","Clio RS","Captur","Megane","Megane RS","Austral","Arkana","Kadjar","Koleos","Twingo","Scenic"],
-      "Dacia": ["Sandero","Logan","Duster","Jogger","Spring"],
-      "Peugeot": ["208","e-208","208 GTi","308","308 GT","508","508 PSE","2008","e-2008","3008","5008"],
-      "Citroën": ["C3","C3 Aircross","C4","C4 X","C5 X","C5 Aircross","Berlingo","ë-C4"],
-      "DS": ["DS 3","DS 4","DS 7","DS 9"],
-      "Opel": ["Corsa","Corsa-e","Astra","Insignia","Mokka","Crossland","Grandland"],
-      "Vauxhall": ["Corsa","Astra","Insignia","Mokka","Crossland","Grandland"],
-      "Ford": ["Fiesta","Fiesta ST","Puma","Puma ST","Focus","Focus ST","Focus RS","Mondeo","Kuga","S-Max","Galaxy","Mustang","Mustang Mach-E"],
-      "Fiat": ["500","500 Abarth","500X","Panda","Tipo","Doblo"],
-      "Abarth": ["595","695"],
-      "Alfa Romeo": ["Giulia","Giulia Quadrifoglio","Stelvio","Stelvio Quadrifoglio","Tonale"],
-      "Lancia": ["Ypsilon"],
-      "Toyota": ["Aygo","Aygo X","Yaris","GR Yaris","Corolla","GR Corolla","Camry","C-HR","RAV4","GR86","Supra","Avensis","Highlander","Proace"],
-      "Lexus": ["CT","IS","IS F","ES","GS","RC","RC F","NX","RX","UX","LC","LC 500"],
-      "Nissan": ["Micra","Leaf","Juke","Juke Nismo","Qashqai","X-Trail","370Z","GT-R"],
-      "Mazda": ["2","3","6","CX-3","CX-30","CX-5","MX-5"],
-      "Honda": ["Jazz","Civic","Civic Type R","Accord","HR-V","CR-V","e"],
-      "Subaru": ["Impreza","WRX STI","XV","Forester","Outback","BRZ"],
-      "Suzuki": ["Swift","Swift Sport","Ignis","Baleno","Vitara","S-Cross","Jimny"],
-      "Hyundai": ["i10","i20","i20 N","i30","i30 N","Elantra N","Tucson","Kona","Kona N","Santa Fe","Ioniq 5","Ioniq 6"],
-      "Kia": ["Picanto","Picanto GT-Line","Rio","Ceed","Proceed","Stonic","Sportage","Sorento","Niro","EV6","EV6 GT"],
-      "Volvo": ["S60","S60 Polestar","V60","V60 Polestar","S90","V90","XC40","XC60","XC90","EX30","EX90"],
-      "Jaguar": ["XE","XF","XJ","E-Pace","F-Pace","I-Pace","F-Type"],
-      "Land Rover": ["Defender","Discovery Sport","Discovery","Range Rover Evoque","Range Rover Velar","Range Rover Sport","Range Rover"],
-      "MINI": ["3 Door","5 Door","Clubman","Countryman","Convertible","Cooper S","JCW","Electric"],
-      "Porsche": ["718 Cayman","718 Boxster","718 GT4","911 Carrera","911 Turbo","911 GT3","Taycan","Panamera","Macan","Cayenne"],
-      "Tesla": ["Model 3","Model Y","Model S","Model X"],
-      "Smart": ["fortwo","forfour","#1"],
-      "Mitsubishi": ["Space Star","ASX","Eclipse Cross","Outlander","L200"],
-      "Jeep": ["Renegade","Compass","Cherokee","Grand Cherokee","Wrangler"]
-    };
-    const OTHER_MAKE = "Inna marka…";
-    const OTHER_MODEL = "Inny model…";
-
-    function populateMakes() {
-      const makeSel = $('makeSelect');
-      if (!makeSel) return;
-      makeSel.innerHTML = '';
-      const def = document.createElement('option'); def.value = ''; def.textContent = '— wybierz markę —'; makeSel.appendChild(def);
-      Object.keys(CAR_DATA).sort().forEach(m => { const o = document.createElement('option'); o.value = m; o.textContent = m; makeSel.appendChild(o); });
-      const other = document.createElement('option'); other.value = OTHER_MAKE; other.textContent = OTHER_MAKE; makeSel.appendChild(other);
-      onMakeChange();
-    }
-    function onMakeChange() {
-      const makeSel = $('makeSelect'), modelSel = $('modelSelect');
-      const makeCustomWrap = $('makeCustomWrap'), modelCustomWrap = $('modelCustomWrap');
-      const makeVal = makeSel.value;
-      makeCustomWrap.style.display = (makeVal === OTHER_MAKE) ? 'block' : 'none';
-      modelSel.innerHTML = '';
-      const def = document.createElement('option'); def.value=''; def.textContent='— wybierz model —'; modelSel.appendChild(def);
-      let models = [];
-      if (makeVal && makeVal !== OTHER_MAKE) models = CAR_DATA[makeVal] || [];
-      models.forEach(md => { const o = document.createElement('option'); o.value = md; o.textContent = md; modelSel.appendChild(o); });
-      const other = document.createElement('option'); other.value = OTHER_MODEL; other.textContent = OTHER_MODEL; modelSel.appendChild(other);
-      modelCustomWrap.style.display = 'none';
-    }
-    document.addEventListener('change', (ev) => {
-      if (ev.target && ev.target.id === 'modelSelect') {
-        $('modelCustomWrap').style.display = (ev.target.value === OTHER_MODEL) ? 'block' : 'none';
-      }
-    });
-    function getSelectedMakeModel() {
-      const makeSel = $('makeSelect'), modelSel = $('modelSelect');
-      const makeCustom = $('makeCustom'), modelCustom = $('modelCustom');
-      let make = '', model = '';
-      make = (makeSel.value === OTHER_MAKE) ? (makeCustom.value||'').trim() : (makeSel.value||'');
-      model = (modelSel.value === OTHER_MODEL) ? (modelCustom.value||'').trim() : (modelSel.value||'');
-      return { make, model };
-    }
-    function populateYears() {
-      const y = $('year'); if(!y) return;
-      const now = new Date().getFullYear();
-      y.innerHTML = '<option value="">— wybierz rok —</option>';
-      for(let yy=now; yy>=1980; yy--) {
-        const o = document.createElement('option'); o.value=yy; o.textContent=yy; y.appendChild(o);
-      }
-    }
-    function enforcePlate(el){ el.value = (el.value || '').toUpperCase().replace(/[^A-Z0-9]/g,''); }
-
-    // ====== Toast ======
-    function toast(msg){ const t = $('toast'); t.textContent = msg || '✓ Zapisano'; t.style.display = 'block'; setTimeout(() => t.style.display = 'none', 1600); }
-
-    // ====== Konto ======
-    async function register(){
-      const email = $('regEmail').value || '', name = $('regName').value || '', pass = $('regPass').value || '';
-      if(!email || !name || !pass) return alert('Uzupełnij e-mail, imię i hasło.');
-      await api('/api/register', { method:'POST', body: JSON.stringify({ email, name, password: pass }), headers:{'Content-Type':'application/json'} });
-      toast('Konto utworzone. Zaloguj się.');
-    }
-    async function login(){
-      try {
-        const res = await api('/api/login', { method:'POST', body: JSON.stringify({ email: $('regEmail').value, password: $('regPass').value }), headers:{'Content-Type':'application/json'} });
-        currentUserName = res.user.name || '';
-        $('helloUser').textContent = currentUserName ? ('Cześć, ' + currentUserName) : 'Zalogowano';
-        $('authBtn').style.display='none'; $('logoutBtn').style.display='inline-block'; closeAuthModal();
-        window.loggedIn = true;
-        await loadVehicles(); await loadReminderVehicles(); await refreshEntries(); await loadStats(); await loadReminders(); await loadSchedules();
-        await loadFuelLogs(); await loadTrips();
-        populateYears();
-      } catch(e) { alert('Błędne dane logowania.'); }
-    }
-    async function logout(){ try{ await api('/api/logout',{method:'POST'}) }catch(e){} window.loggedIn=false; location.reload(); }
-
-    // ====== Pojazdy ======
-    async function loadVehicles(){
-      const list = await api('/api/vehicles');
-      const sel = $('vehicleSelect'),
-            rsel = $('r_vehicle'),
-            ssel = $('s_vehicle'),
-            fsel = $('fuel_vehicle'),
-            tsel = $('trip_vehicle');
-      sel.innerHTML='';
-      if(rsel) rsel.innerHTML='<option value="">—</option>';
-      if(ssel) ssel.innerHTML='<option value="">—</option>';
-      if(fsel) fsel.innerHTML='<option value="">— wybierz —</option>';
-      if(tsel) tsel.innerHTML='<option value="">— wybierz —</option>';
-
-      list.forEach(v => {
-        const label = (v.make + ' ' + v.model + ' ' + (v.year||'') + (v.fuel?(' • '+v.fuel):'') + ' ' + (v.reg_plate||'')).trim();
-        const o = document.createElement('option'); o.value = v.id; o.textContent = label; sel.appendChild(o);
-        if(rsel){ const o2 = document.createElement('option'); o2.value = v.id; o2.textContent = label; rsel.appendChild(o2); }
-        if(ssel){ const o3 = document.createElement('option'); o3.value = v.id; o3.textContent = label; ssel.appendChild(o3); }
-        if(fsel){ const o4 = document.createElement('option'); o4.value = v.id; o4.textContent = label; fsel.appendChild(o4); }
-        if(tsel){ const o5 = document.createElement('option'); o5.value = v.id; o5.textContent = label; tsel.appendChild(o5); }
-      });
-      if(list.length) {
-        sel.value = String(list[0].id);
-        if(fsel && !fsel.value) fsel.value = String(list[0].id);
-        if(tsel && !tsel.value) tsel.value = String(list[0].id);
-      }
-    }
-    async function addVehicle(){
-      const { make, model } = getSelectedMakeModel();
-      if (!make || !model) return alert('Wybierz markę i model (lub wpisz własne).');
-      const body = {
-        make, model,
-        year: parseInt($('year').value||0)||null,
-        fuel: $('fuel').value || null,
-        reg_plate: $('reg_plate').value
-      };
-      await api('/api/vehicles', { method:'POST', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-      toast('Dodano pojazd'); await loadVehicles(); await loadStats(); await loadReminders(); await loadSchedules(); await loadFuelLogs(); await loadTrips();
-    }
-    async function deleteSelectedVehicle(){
-      const sel = $('vehicleSelect'); if(!sel.value) return alert('Wybierz pojazd');
-      if(!confirm('Usunąć wybrany pojazd wraz z wpisami?')) return;
-      await api('/api/vehicles/' + sel.value, {method:'DELETE'});
-      toast('Usunięto pojazd'); await loadVehicles(); await loadStats(); await loadReminders(); await refreshEntries(); await loadSchedules(); await loadFuelLogs(); await loadTrips();
-    }
-
-    // ====== Wpisy ======
-    let editEntryId = null;
-    async function addEntry(){
-      const sel = $('vehicleSelect'); if(!sel.value) return alert('Najpierw dodaj pojazd.');
-      const fd = new FormData();
-      fd.append('vehicle_id', sel.value);
-      fd.append('date', $('date').value);
-      fd.append('mileage', $('mileage').value);
-      fd.append('service_type', $('service_type').value);
-      fd.append('description', $('description').value);
-      fd.append('cost', $('cost').value);
-      const f = $('file').files[0]; if (f) fd.append('file', f);
-      if(editEntryId){
-        const body = { date:$('date').value, mileage:$('mileage').value, service_type:$('service_type').value, description:$('description').value, cost:$('cost').value };
-        await api('/api/entries/' + editEntryId, { method:'PUT', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-        editEntryId = null;
-        document.querySelector('button.primary').textContent = 'Dodaj wpis';
-      } else {
-        await api('/api/entries', { method:'POST', body: fd });
-        $('file').value = '';
-      }
-      toast('Zapisano'); await refreshEntries();
-    }
-    function editEntry(id){
-      const e = (window._entriesCache||[]).find(x => String(x.id) === String(id)); if(!e) return;
-      editEntryId = id;
-      $('date').value = onlyDate(e.date) || '';
-      $('mileage').value = e.mileage || '';
-      $('service_type').value = e.service_type || ''; $('description').value = e.description || ''; $('cost').value = e.cost || '';
-      document.querySelector('button.primary').textContent = 'Zapisz zmiany';
-      window.scrollTo({ top: 0, behavior: 'smooth' });
-    }
-    async function delEntry(id){ if(!confirm('Usunąć wpis?')) return; await api('/api/entries/' + id, {method:'DELETE'}); toast('Usunięto'); refreshEntries(); }
-    async function refreshEntries(){
-      const sel = $('vehicleSelect'); 
-      const currentVehicleId = sel.value || null;
-      const q = $('search').value || ''; 
-      const params = new URLSearchParams();
-      if(currentVehicleId) params.set('vehicle_id', currentVehicleId); 
-      if(q) params.set('q', q);
-    
-      let list = []; 
-      try { 
-        list = await api('/api/entries?' + params.toString()); 
-      } catch(e){ 
-        return; 
-      }
-    
-      window._entriesCache = list; 
-      const tb = $('entriesTbody'); 
-      tb.innerHTML = '';
-    
-      list.forEach(e => {
-        const tr = document.createElement('tr');
-    
-        const formattedDate = formatDatePl(e.date);
-        const mileageFormatted = (e.mileage != null && e.mileage.toLocaleString)
-          ? e.mileage.toLocaleString("pl-PL")
-          : (e.mileage || '');
-    
-        tr.innerHTML =
-          '<td>'+ formattedDate +'</td>' +
-          '<td>'+ mileageFormatted +'</td>' +
-          '<td>'+ e.service_type +'</td>' +
-          '<td>'+ (e.description || "") +'</td>' +
-          '<td>'+ Number(e.cost||0).toLocaleString("pl-PL",{minimumFractionDigits:2, maximumFractionDigits:2}) +'</td>' +
-          '<td>'+ (e.attachment ? ('<a target=_blank href="/uploads/' + e.attachment + '">plik</a>') : '') +'</td>' +
-          '<td class="actions">' +
-            '<button type="button" onclick="editEntry('+e.id+')">Edytuj</button> ' +
-            '<button type="button" onclick="delEntry('+e.id+')">Usuń</button>' +
-          '</td>';
-    
-        tb.appendChild(tr);
-      });
-    
-      await loadStats();
-    }
-
-    // ====== Tankowania (frontend) ======
-    async function loadFuelLogs(){
-      const sel = $('fuel_vehicle');
-      if(!sel) return;
-      const vid = sel.value || '';
-      const params = new URLSearchParams();
-      if(vid) params.set('vehicle_id', vid);
-      let list = [];
-      try { list = await api('/api/fuel_logs?' + params.toString()); } catch(e){ return; }
-      const tb = $('fuelTbody'); if(!tb) return;
-      tb.innerHTML = '';
-      list.forEach(f => {
-        const tr = document.createElement('tr');
-        tr.innerHTML =
-          '<td>'+ formatDatePl(f.date) +'</td>' +
-          '<td>'+ (f.station || '') +'</td>' +
-          '<td>'+ (f.liters != null ? Number(f.liters).toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) : '') +'</td>' +
-          '<td>'+ (f.price_per_liter != null ? Number(f.price_per_liter).toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) : '') +'</td>' +
-          '<td>'+ (f.total_cost != null ? Number(f.total_cost).toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) : '') +'</td>' +
-          '<td>'+ (f.odometer != null ? Number(f.odometer).toLocaleString('pl-PL') : '') +'</td>' +
-          '<td>'+ (f.full_tank ? 'tak' : 'nie') +'</td>' +
-          '<td class="actions"><button type="button" onclick="deleteFuelLog('+f.id+')">Usuń</button></td>';
-        tb.appendChild(tr);
-      });
-    }
-    async function addFuelLog(){
-      const vid = $('fuel_vehicle').value;
-      if(!vid) return alert('Wybierz pojazd dla tankowania.');
-      const body = {
-        vehicle_id: vid,
-        date: $('fuel_date').value || null,
-        station: $('fuel_station').value || null,
-        liters: $('fuel_liters').value || null,
-        price_per_liter: $('fuel_price').value || null,
-        odometer: $('fuel_odometer').value || null,
-        full_tank: $('fuel_full').checked
-      };
-      await api('/api/fuel_logs', { method:'POST', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-      toast('Zapisano tankowanie');
-      $('fuel_station').value=''; $('fuel_liters').value=''; $('fuel_price').value=''; $('fuel_odometer').value=''; $('fuel_full').checked=true;
-      await loadFuelLogs(); await loadStats();
-    }
-    async function deleteFuelLog(id){
-      if(!confirm('Usunąć wpis tankowania?')) return;
-      await api('/api/fuel_logs/' + id, { method:'DELETE' });
-      toast('Usunięto tankowanie');
-      await loadFuelLogs(); await loadStats();
-    }
-
-    // ====== Trasy (frontend) ======
-    async function loadTrips(){
-      const sel = $('trip_vehicle');
-      if(!sel) return;
-      const vid = sel.value || '';
-      const params = new URLSearchParams();
-      if(vid) params.set('vehicle_id', vid);
-      let list = [];
-      try { list = await api('/api/trips?' + params.toString()); } catch(e){ return; }
-      const tb = $('tripTbody'); if(!tb) return;
-      tb.innerHTML = '';
-      list.forEach(t => {
-        const dateStr = formatDatePl(t.start_date) + (t.end_date ? ' - ' + formatDatePl(t.end_date) : '');
-        const route = (t.start_location || '') + (t.end_location ? ' → ' + t.end_location : '');
-        const dist = (t.distance_km != null ? Number(t.distance_km).toLocaleString('pl-PL',{maximumFractionDigits:1}) : '');
-        const timeRange = (formatTimeHm(t.start_time) || '') + (t.end_time ? ('–' + formatTimeHm(t.end_time)) : '');
-        const avg = (t.avg_consumption != null ? Number(t.avg_consumption).toLocaleString('pl-PL',{minimumFractionDigits:1, maximumFractionDigits:1}) : '');
-        const status = t.planned ? 'planowana' : 'zrealizowana';
-        const tr = document.createElement('tr');
-        tr.innerHTML =
-          '<td>'+dateStr+'</td>' +
-          '<td>'+route+'</td>' +
-          '<td>'+dist+'</td>' +
-          '<td>'+timeRange+'</td>' +
-          '<td>'+avg+'</td>' +
-          '<td>'+status+'</td>' +
-          '<td class="actions"><button type="button" onclick="deleteTrip('+t.id+')">Usuń</button></td>';
-        tb.appendChild(tr);
-      });
-    }
-    async function addTrip(){
-      const vid = $('trip_vehicle').value;
-      if(!vid) return alert('Wybierz pojazd dla trasy.');
-      const body = {
-        vehicle_id: vid,
-        start_date: $('trip_start_date').value || null,
-        end_date: $('trip_end_date').value || null,
-        start_time: $('trip_start_time').value || null,
-        end_time: $('trip_end_time').value || null,
-        start_location: $('trip_start_loc').value || null,
-        end_location: $('trip_end_loc').value || null,
-        distance_km: $('trip_distance').value || null,
-        avg_consumption: $('trip_avg_consumption').value || null,
-        planned: $('trip_planned').checked,
-        notes: $('trip_notes').value || null
-      };
-      await api('/api/trips', { method:'POST', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-      toast('Zapisano trasę');
-      $('trip_start_date').value=''; $('trip_end_date').value='';
-      $('trip_start_time').value=''; $('trip_end_time').value='';
-      $('trip_start_loc').value=''; $('trip_end_loc').value='';
-      $('trip_distance').value=''; $('trip_avg_consumption').value=''; $('trip_planned').checked=false; $('trip_notes').value='';
-      await loadTrips();
-    }
-    async function deleteTrip(id){
-      if(!confirm('Usunąć trasę?')) return;
-      await api('/api/trips/' + id, { method:'DELETE' });
-      toast('Usunięto trasę');
-      await loadTrips();
-    }
-
-    // ====== Statystyki ======
-    const BarValueLabels = {
-      id: 'barValueLabels',
-      afterDatasetsDraw(chart) {
-        const {ctx} = chart;
-        ctx.save();
-        const ds = chart.getDatasetMeta(0);
-        ds.data.forEach((bar, i) => {
-          const val = chart.data.datasets[0].data[i];
-          if (val == null) return;
-          const label = Number(val).toLocaleString('pl-PL', {minimumFractionDigits:2, maximumFractionDigits:2});
-          ctx.font = '12px system-ui, -apple-system, Segoe UI, Roboto, Arial';
-          ctx.fillStyle = '#f3f4f6';
-          ctx.textAlign = 'center';
-          ctx.fillText(label, bar.x, bar.y - 6);
-        });
-        ctx.restore();
-      }
-    };
-
-    async function loadStats(){
-      try{
-        const s = await api('/api/stats');
-        window._dailyVehicleCosts = s.daily_vehicle_costs || [];
-
-        const range = parseInt(($('dash_range')?.value || '0'), 10);
-        let cutoff = null;
-        if (range > 0) {
-          cutoff = new Date();
-          cutoff.setHours(0,0,0,0);
-          cutoff.setDate(cutoff.getDate() - range + 1);
-        }
-
-        const sumsByVehicle = {};
-        const labelsByVehicle = {};
-        (window._dailyVehicleCosts || []).forEach(row => {
-          const d = new Date(row.ymd + 'T00:00:00');
-          if (cutoff) {
-            if (isNaN(d)) return;
-            d.setHours(0,0,0,0);
-            if (d < cutoff) return;
-          }
-          const vid = row.vehicle_id;
-          const label = row.label || ('Pojazd #' + vid);
-          labelsByVehicle[vid] = label;
-          sumsByVehicle[vid] = (sumsByVehicle[vid] || 0) + Number(row.total_cost || 0);
-        });
-
-        const vehicleIds = Object.keys(labelsByVehicle).sort((a,b) => {
-          return (labelsByVehicle[a]||'').localeCompare(labelsByVehicle[b]||'', 'pl');
-        });
-
-        // ====== Wykres: koszt wg pojazdu (kolory per pojazd) ======
-        const ctx = $('chartCost')?.getContext('2d');
-        if (ctx) {
-          const labels = vehicleIds.map(vid => labelsByVehicle[vid] || ('Pojazd #' + vid));
-          const dataVals = vehicleIds.map(vid => sumsByVehicle[vid] || 0);
-          const colors = vehicleIds.map(vid => getVehicleColor(vid));
-
-          if(window._chartCost) window._chartCost.destroy();
-          window._chartCost = new Chart(ctx, {
-            type:'bar',
-            data:{
-              labels,
-              datasets:[{
-                label:'Koszt (PLN) / pojazd',
-                data:dataVals,
-                backgroundColor:colors,
-                borderColor:colors,
-                borderWidth:1
-              }]
-            },
-            options:{
-              responsive:true,
-              interaction:{ mode:'index', intersect:false },
-              scales:{
-                x:{ grid:{color:'#222'}, ticks:{color:'#f3f4f6', maxRotation:0, autoSkip:true} },
-                y:{ grid:{color:'#222'}, ticks:{color:'#f3f4f6'} }
-              },
-              plugins:{
-                legend:{ labels:{ color:'#f3f4f6' } },
-                tooltip:{ callbacks:{ label:(c)=> ' ' + Number(c.raw||0).toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) + ' PLN' } }
-              }
-            },
-            plugins:[BarValueLabels]
-          });
-        }
-
-        // ====== Tabela suma kosztów per pojazd (z kolorami) ======
-        const tBody = $('sumByVehicleTbody'); tBody.innerHTML = '';
-        let grand = 0;
-        vehicleIds.forEach(vid => {
-          const sum = sumsByVehicle[vid] || 0;
-          grand += sum;
-          const color = getVehicleColor(vid);
-          const tr = document.createElement('tr');
-          tr.style.borderLeft = '4px solid ' + color;
-          tr.innerHTML = '<td>'+ (labelsByVehicle[vid]||('Pojazd #'+vid)) +'</td><td>'+
-            sum.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) +'</td>';
-          tBody.appendChild(tr);
-        });
-        $('sumAll').textContent = grand.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2});
-
-        // ====== Tabela ostatnich przebiegów (również z kolorami) ======
-        const tb = $('mileageTbody'); if(tb){ tb.innerHTML='';
-          (s.last_mileage||[]).forEach(r => {
-            const color = getVehicleColor(r.vehicle_id);
-            const tr = document.createElement('tr');
-            tr.style.borderLeft = '4px solid ' + color;
-            tr.innerHTML = '<td>'+(r.label||'-')+'</td><td>'+Number(r.mileage||0).toLocaleString('pl-PL')+'</td>';
-            tb.appendChild(tr);
-          });
-        }
-
-        // ====== Średnie spalanie (fuel_stats) ======
-        const fsBody = $('fuelSummaryTbody');
-        if(fsBody){
-          fsBody.innerHTML = '';
-          (s.fuel_stats || []).forEach(row => {
-            const color = getVehicleColor(row.vehicle_id);
-            const tr = document.createElement('tr');
-            tr.style.borderLeft = '4px solid ' + color;
-            const avg = row.avg_l_100km != null
-              ? Number(row.avg_l_100km).toLocaleString('pl-PL',{minimumFractionDigits:1, maximumFractionDigits:1})
-              : '-';
-            const dist = row.distance_km != null
-              ? Number(row.distance_km).toLocaleString('pl-PL',{maximumFractionDigits:0})
-              : '-';
-            const liters = Number(row.total_liters || 0).toLocaleString('pl-PL',{minimumFractionDigits:1, maximumFractionDigits:1});
-            tr.innerHTML =
-              '<td>'+ (row.label || '-') +'</td>' +
-              '<td>'+ liters +'</td>' +
-              '<td>'+ dist +'</td>' +
-              '<td>'+ avg +'</td>';
-            fsBody.appendChild(tr);
-          });
-        }
-
-        // ====== Kalendarz kosztów (osobna karta) ======
-        const monthInput = $('cal_month');
-        if (monthInput && !monthInput.value) {
-          const now = new Date();
-          monthInput.value = now.toISOString().slice(0,7);
-        }
-        renderCostCalendar();
-
-      }catch(e){ console.error(e); }
-    }
-
-    function renderCostCalendar(){
-      const grid = $('calendarGrid');
-      if(!grid) return;
-      grid.innerHTML = '';
-      const data = window._dailyVehicleCosts || [];
-      if (!data.length) return;
-
-      const monthInput = $('cal_month');
-      let year, month;
-      if (monthInput && monthInput.value) {
-        const parts = monthInput.value.split('-');
-        year = parseInt(parts[0],10);
-        month = parseInt(parts[1],10);
-      } else {
-        const now = new Date();
-        year = now.getFullYear();
-        month = now.getMonth() + 1;
-        if (monthInput) monthInput.value = now.toISOString().slice(0,7);
-      }
-
-      const daysInMonth = new Date(year, month, 0).getDate();
-      const firstDay = new Date(year, month-1, 1);
-      // JS: 0=niedziela, my chcemy 0=poniedziałek
-      let offset = (firstDay.getDay() + 6) % 7;
-
-      const byDate = {};
-      data.forEach(row => {
-        const ymd = row.ymd;
-        if(!ymd) return;
-        const d = new Date(ymd + 'T00:00:00');
-        if (isNaN(d)) return;
-        if (d.getFullYear() !== year || (d.getMonth()+1) !== month) return;
-        if(!byDate[ymd]) byDate[ymd] = [];
-        byDate[ymd].push(row);
-      });
-
-      for(let i=0;i<offset;i++){
-        const empty = document.createElement('div');
-        empty.className = 'calendar-cell';
-        grid.appendChild(empty);
-      }
-
-      for(let day=1; day<=daysInMonth; day++){
-        const ymd = year + '-' + pad2(month) + '-' + pad2(day);
-        const rows = byDate[ymd] || [];
-        const totalForDay = rows.reduce((s,r) => s + Number(r.total_cost || 0), 0);
-        const cell = document.createElement('div');
-        cell.className = 'calendar-cell';
-
-        const dayNum = document.createElement('div');
-        dayNum.className = 'day-num';
-        dayNum.textContent = day;
-        cell.appendChild(dayNum);
-
-        if (totalForDay > 0) {
-          const totalDiv = document.createElement('div');
-          totalDiv.className = 'cost-total';
-          totalDiv.textContent = 'Razem: ' + totalForDay.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) + ' zł';
-          cell.appendChild(totalDiv);
-
-          rows.forEach(r => {
-            const entry = document.createElement('div');
-            entry.className = 'entry';
-            const service = Number(r.service_cost || 0);
-            const fuel = Number(r.fuel_cost || 0);
-            let details = '';
-            if (service > 0) details += 'serwis ' + service.toLocaleString('pl-PL',{maximumFractionDigits:2}) + ' zł';
-            if (fuel > 0) {
-              if (details) details += ', ';
-              details += 'paliwo ' + fuel.toLocaleString('pl-PL',{maximumFractionDigits:2}) + ' zł';
-            }
-            entry.textContent = '• ' + (r.label || '-') + ' — ' + details;
-
-            const color = getVehicleColor(r.vehicle_id);
-            entry.style.borderLeft = '3px solid ' + color;
-            entry.style.paddingLeft = '6px';
-
-            entry.addEventListener('mouseenter', () => {
-              const popup = document.createElement('div');
-              popup.className = 'calendar-popup';
-              const total = Number(r.total_cost || (service + fuel));
-              popup.innerHTML =
-                '<strong>' + (r.label || '-') + '</strong><br>' +
-                'Data: ' + formatDatePl(ymd) + '<br>' +
-                'Serwis: ' + service.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) + ' zł<br>' +
-                'Paliwo: ' + fuel.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) + ' zł<br>' +
-                'Razem: ' + total.toLocaleString('pl-PL',{minimumFractionDigits:2, maximumFractionDigits:2}) + ' zł';
-              document.body.appendChild(popup);
-              const rect = entry.getBoundingClientRect();
-              popup.style.top = (rect.bottom + 4) + 'px';
-              popup.style.left = rect.left + 'px';
-              entry._popup = popup;
-            });
-
-            entry.addEventListener('mouseleave', () => {
-              if (entry._popup) {
-                entry._popup.remove();
-                entry._popup = null;
-              }
-            });
-
-            cell.appendChild(entry);
-          });
-        }
-
-        grid.appendChild(cell);
-      }
-    }
-
-    // ====== Przypomnienia ======
-    async function loadReminders(){
-      try{
-        const list = await api('/api/reminders');
-        const tb = $('r_tbody'); if(!tb) return; tb.innerHTML = '';
-        list.forEach(r => {
-          const tr = document.createElement('tr');
-          const due = r.is_due ? '🔔' : '';
-          tr.innerHTML =
-            '<td>' + due + '</td>' +
-            '<td>' + r.title + '</td>' +
-            '<td>' + (r.due_date ? formatDatePl(r.due_date) : '') + '</td>' +
-            '<td>' + (r.due_mileage||'') + '</td>' +
-            '<td>' + (r.notify_email ? 'tak' : 'nie') + '</td>' +
-            '<td>' + (r.notify_before_days ?? '') + '</td>' +
-            '<td>' + (r.vehicle_id || '') + '</td>' +
-            '<td class="actions"><button type="button" onclick="completeReminder(' + r.id + ')">Zakończ</button> <button type="button" onclick="deleteReminder(' + r.id + ')">Usuń</button></td>';
-          tb.appendChild(tr);
-        });
-      }catch(e){}
-    }
-    async function loadReminderVehicles(){
-      try{
-        const list = await api('/api/vehicles'); const rsel = $('r_vehicle'); if(!rsel) return;
-        rsel.innerHTML = '<option value="">—</option>';
-        list.forEach(v => { const o = document.createElement('option'); o.value = v.id; o.textContent = (v.make+' '+v.model+' '+(v.year||'')+' '+(v.reg_plate||'')).trim(); rsel.appendChild(o); });
-      }catch(e){}
-    }
-    async function addReminder(){
-      const selType = $('r_type'), custom = $('r_type_custom');
-      const typeVal = selType && selType.value === 'Inne' ? (custom.value||'').trim() : (selType ? selType.value : '');
-      if(!typeVal) return alert('Wybierz rodzaj lub wpisz własny powód.');
-      const body = {
-        title: typeVal,
-        due_date: $('r_date').value || null,
-        due_mileage: $('r_mileage').value || null,
-        vehicle_id: $('r_vehicle').value || null,
-        notify_email: $('r_notify_mail').checked,
-        notify_before_days: parseInt($('r_notify_days').value || '') || 7
-      };
-      await api('/api/reminders', { method:'POST', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-      toast('Dodano przypomnienie'); selType.value='Przegląd techniczny'; if(custom) custom.value='';
-      $('r_date').value=''; $('r_mileage').value=''; $('r_type_custom_wrap').style.display='none'; $('r_notify_mail').checked=false; $('r_notify_days').value='';
-      await loadReminders();
-    }
-    async function completeReminder(id){ await api('/api/reminders/' + id, { method:'PUT', body: JSON.stringify({ completed_at: new Date().toISOString() }), headers:{'Content-Type':'application/json'} }); await loadReminders(); }
-    async function deleteReminder(id){ await api('/api/reminders/' + id, { method:'DELETE' }); await loadReminders(); }
-
-    // ====== Harmonogramy ======
-    async function loadSchedules(){
-      const tb = $('s_tbody'); if(!tb) return; tb.innerHTML='';
-      const list = await api('/api/schedules');
-      list.forEach(s => {
-        const inter = [(s.interval_months? (s.interval_months+' mies.'):'') , (s.interval_km? (s.interval_km+' km'):'')].filter(Boolean).join(' / ') || '-';
-        const next = (s.next_due_date ? formatDatePl(s.next_due_date) : (s.next_due_mileage || '-'));
-        const tr = document.createElement('tr');
-        tr.innerHTML = '<td>'+s.kind+'</td><td>'+inter+'</td><td>'+next+'</td><td>'+(s.vehicle_id||'')+'</td>' +
-                       '<td class="actions"><button type="button" onclick="deleteSchedule('+s.id+')">Usuń</button></td>';
-        tb.appendChild(tr);
-      });
-    }
-    async function addSchedule(){
-      const body = {
-        vehicle_id: $('s_vehicle').value || null,
-        kind: $('s_kind').value || 'Serwis okresowy',
-        interval_months: parseInt($('s_interval_m').value || '') || null,
-        interval_km: parseInt($('s_interval_km').value || '') || null,
-        last_service_date: $('s_last_date').value || null,
-        last_service_mileage: parseInt($('s_last_mil').value || '') || null
-      };
-      await api('/api/schedules', { method:'POST', body: JSON.stringify(body), headers:{'Content-Type':'application/json'} });
-      toast('Dodano harmonogram'); $('s_kind').value=''; $('s_interval_m').value=''; $('s_interval_km').value=''; $('s_last_date').value=''; $('s_last_mil').value='';
-      await loadSchedules();
-    }
-    async function deleteSchedule(id){ await api('/api/schedules/' + id, { method:'DELETE' }); await loadSchedules(); }
-
-    // ====== Init ======
-    document.addEventListener('DOMContentLoaded', () => { populateMakes(); populateYears(); });
-
-    Object.assign(window, {
-      openAuthModal, closeAuthModal, openReminders, closeReminders, openSchedules, closeSchedules, backdropClose,
-      register, login, logout,
-      loadVehicles, addVehicle, deleteSelectedVehicle,
-      addEntry, refreshEntries, delEntry, editEntry,
-      loadStats, loadReminders, loadReminderVehicles,
-      addReminder, completeReminder, deleteReminder,
-      loadSchedules, addSchedule, deleteSchedule,
-      onMakeChange, enforcePlate,
-      loadFuelLogs, addFuelLog, deleteFuelLog,
-      loadTrips, addTrip, deleteTrip,
-      renderCostCalendar
-    });
-  </script>
+  <script src="/static/app.{APP_JS_VER}.js" defer></script>
 </body>
 </html>
 """
 
+# Powłoka HTML renderowana raz przy starcie — per żądanie nie ma już
+# żadnego .replace() ani wysyłki osadzonego skryptu
+_INDEX_RENDERED = INDEX_HTML.replace("{APP_TITLE}", APP_TITLE).replace(
+    "{APP_JS_VER}", APP_JS_VER
+)
+
 
 @app.get("/")
 def index_page():
-    return INDEX_HTML.replace("{APP_TITLE}", APP_TITLE)
+    return _INDEX_RENDERED
+
+
+@app.get("/static/app.<string:ver>.js")
+def app_js(ver):
+    # hash treści siedzi w nazwie pliku, więc odpowiedź może być cachowana
+    # bezterminowo — nowa wersja skryptu to nowy URL w powłoce
+    resp = send_from_directory(_STATIC_DIR, "app.js", max_age=31536000)
+    resp.cache_control.immutable = True
+    return resp
 
 
 if __name__ == "__main__":
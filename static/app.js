@@ -0,0 +1,1058 @@
+// $ z pamięcią: gorące ścieżki (refreshEntries/loadStats/kalendarz)
+// wołają getElementById wielokrotnie na tych samych, statycznych id;
+// isConnected chroni przed zwróceniem węzła podmienionego w DOM
+const _elCache = new Map();
+const $ = (id) => {
+  let el = _elCache.get(id);
+  if (!el || !el.isConnected) {
+    el = document.getElementById(id);
+    if (el) _elCache.set(id, el); else _elCache.delete(id);
+  }
+  return el;
+};
+window.loggedIn = false;
+window._entriesCache = [];
+window._entriesById = new Map();
+window._dailyVehicleCosts = [];
+window._dvcByMonth = new Map();   // 'YYYY-MM' -> Map(ymd -> rows[])
+window._dvcTotalByDate = new Map(); // ymd -> suma kosztów dnia
+let currentUserName = '';
+
+// ====== Kolory pojazdów ======
+const VEHICLE_COLOR_PALETTE = [
+  '#ef4444', '#f97316', '#eab308', '#22c55e', '#14b8a6',
+  '#0ea5e9', '#6366f1', '#a855f7', '#ec4899', '#f97373',
+  '#fb923c', '#84cc16', '#22c55e', '#2dd4bf', '#38bdf8',
+  '#818cf8', '#a855f7', '#d946ef', '#f97373', '#f59e0b'
+];
+// Map zamiast zwykłego obiektu: .size jest O(1), a Object.keys().length
+// skanowało wszystkie klucze przy każdym nowym pojeździe
+const VEHICLE_COLORS = new Map();
+
+function getVehicleColor(vid) {
+  if (vid === null || vid === undefined) return '#9ca3af';
+  const key = String(vid);
+  let c = VEHICLE_COLORS.get(key);
+  if (c) return c;
+  c = VEHICLE_COLOR_PALETTE[VEHICLE_COLORS.size % VEHICLE_COLOR_PALETTE.length];
+  VEHICLE_COLORS.set(key, c);
+  return c;
+}
+
+// ====== Formatery liczb (pl-PL) ======
+// jedna instancja na format — każde toLocaleString z opcjami tworzy
+// wewnętrznie nowy Intl.NumberFormat, co dominowało pętle renderujące
+const FMT_MONEY = new Intl.NumberFormat('pl-PL', {minimumFractionDigits:2, maximumFractionDigits:2});
+const FMT_INT   = new Intl.NumberFormat('pl-PL');
+const FMT_ONE   = new Intl.NumberFormat('pl-PL', {minimumFractionDigits:1, maximumFractionDigits:1});
+const FMT_DIST  = new Intl.NumberFormat('pl-PL', {maximumFractionDigits:1});
+const FMT_INT0  = new Intl.NumberFormat('pl-PL', {maximumFractionDigits:0});
+const FMT_MAX2  = new Intl.NumberFormat('pl-PL', {maximumFractionDigits:2});
+
+// ====== Daty / godziny po polsku ======
+// daty powtarzają się między wierszami, a parsowanie Date jest drogie —
+// wynik zapamiętujemy per surowa wartość (uniwersum dat << liczba wierszy)
+const _fmtDateCache = new Map();
+function formatDatePl(value) {
+  if (!value) return '';
+  const cached = _fmtDateCache.get(value);
+  if (cached !== undefined) return cached;
+
+  const s = String(value).trim();
+
+  // Spróbuj potraktować to jako datę JS
+  const d = new Date(s);
+  if (!isNaN(d.getTime())) {
+    const dd = String(d.getDate()).padStart(2, '0');
+    const mm = String(d.getMonth() + 1).padStart(2, '0');
+    const yyyy = d.getFullYear();
+    const out = dd + '.' + mm + '.' + yyyy; // DD.MM.RRRR
+    _fmtDateCache.set(value, out);
+    return out;
+  }
+
+  // Fallback: tekst w formacie YYYY-MM-DD
+  let out = s;
+  if (s.length >= 10 && s[4] === '-' && s[7] === '-') {
+    out = s.slice(8, 10) + '.' + s.slice(5, 7) + '.' + s.slice(0, 4);
+  }
+  _fmtDateCache.set(value, out);
+  return out;
+}
+
+function formatTimeHm(value) {
+  if (!value) return '';
+  const s = String(value);
+  return s.slice(0, 5); // HH:MM
+}
+
+function onlyDate(value) {
+  if (!value) return '';
+  const s = String(value);
+  if (s.length >= 10) return s.slice(0, 10);
+  return s;
+}
+
+function pad2(n){ return n < 10 ? '0' + n : String(n); }
+
+// praca per pauza zamiast per klawisz (wyszukiwarka odpala fetch!)
+function debounce(fn, d = 300){
+  let t;
+  return (...a) => { clearTimeout(t); t = setTimeout(() => fn(...a), d); };
+}
+
+function escapeHtml(s){
+  return String(s).replace(/[&<>"']/g, c => (
+    c === '&' ? '&amp;' : c === '<' ? '&lt;' : c === '>' ? '&gt;' : c === '"' ? '&quot;' : '&#39;'
+  ));
+}
+
+// ====== Modale ======
+function openAuthModal(){ $('authModal').style.display = 'flex'; }
+function closeAuthModal(){ $('authModal').style.display = 'none'; }
+function openReminders(){ $('remindersModal').style.display = 'flex'; Promise.all([loadReminders(), loadReminderVehicles()]); }
+function closeReminders(){ $('remindersModal').style.display = 'none'; }
+function openSchedules(){ $('schedulesModal').style.display = 'flex'; Promise.all([loadSchedules(), loadScheduleVehicles()]); }
+function closeSchedules(){ $('schedulesModal').style.display = 'none'; }
+function backdropClose(e){ if(e.target.classList.contains('modal-backdrop')) e.target.style.display='none'; }
+
+// ====== Marka / model / rok / nr rejestracyjny ======
+const CAR_DATA = {
+  "Audi": ["A1","A3","S3","RS3","A4","S4","RS4","A5","S5","RS5","A6","S6","RS6","A7","S7","RS7","A8","Q2","Q3","RSQ3","Q5","SQ5","Q7","SQ7","Q8","SQ8","RSQ8","TT","TTS","TTRS","e-tron","e-tron GT","RS e-tron GT"],
+  "BMW": ["1 Series","M135i","2 Series","M240i","3 Series","M3","4 Series","M4","5 Series","M5","7 Series","X1","X3","X3 M","X5","X5 M","X6","X6 M","X7","i3","i4","i5","i7","iX"],
+  "Mercedes-Benz": ["A-Class","AMG A35","AMG A45","C-Class","AMG C43","AMG C63","E-Class","AMG E53","AMG E63","S-Class","GLA","GLB","GLC","AMG GLC 43","GLE","GLS","CLA","AMG CLA 45","CLS","EQA","EQB","EQE","EQS"],
+  "Volkswagen": ["up!","Polo","Polo GTI","Golf","Golf GTI","Golf R","Passat","Arteon","Tiguan","T-Roc","T-Roc R","Touareg","ID.3","ID.4","ID.5"],
+  "Škoda": ["Fabia","Scala","Octavia","Octavia RS","Superb","Kamiq","Karoq","Kodiaq","Enyaq"],
+  "SEAT": ["Ibiza","Arona","Leon","Leon Cupra","Ateca","Tarraco"],
+  "Cupra": ["Born","Formentor","Ateca","Leon"],
+  "Renault": ["Clio","Clio RS","Captur","Megane","Megane RS","Austral","Arkana","Kadjar","Koleos","Twingo","Scenic"],
+  "Dacia": ["Sandero","Logan","Duster","Jogger","Spring"],
+  "Peugeot": ["208","e-208","208 GTi","308","308 GT","508","508 PSE","2008","e-2008","3008","5008"],
+  "Citroën": ["C3","C3 Aircross","C4","C4 X","C5 X","C5 Aircross","Berlingo","ë-C4"],
+  "DS": ["DS 3","DS 4","DS 7","DS 9"],
+  "Opel": ["Corsa","Corsa-e","Astra","Insignia","Mokka","Crossland","Grandland"],
+  "Vauxhall": ["Corsa","Astra","Insignia","Mokka","Crossland","Grandland"],
+  "Ford": ["Fiesta","Fiesta ST","Puma","Puma ST","Focus","Focus ST","Focus RS","Mondeo","Kuga","S-Max","Galaxy","Mustang","Mustang Mach-E"],
+  "Fiat": ["500","500 Abarth","500X","Panda","Tipo","Doblo"],
+  "Abarth": ["595","695"],
+  "Alfa Romeo": ["Giulia","Giulia Quadrifoglio","Stelvio","Stelvio Quadrifoglio","Tonale"],
+  "Lancia": ["Ypsilon"],
+  "Toyota": ["Aygo","Aygo X","Yaris","GR Yaris","Corolla","GR Corolla","Camry","C-HR","RAV4","GR86","Supra","Avensis","Highlander","Proace"],
+  "Lexus": ["CT","IS","IS F","ES","GS","RC","RC F","NX","RX","UX","LC","LC 500"],
+  "Nissan": ["Micra","Leaf","Juke","Juke Nismo","Qashqai","X-Trail","370Z","GT-R"],
+  "Mazda": ["2","3","6","CX-3","CX-30","CX-5","MX-5"],
+  "Honda": ["Jazz","Civic","Civic Type R","Accord","HR-V","CR-V","e"],
+  "Subaru": ["Impreza","WRX STI","XV","Forester","Outback","BRZ"],
+  "Suzuki": ["Swift","Swift Sport","Ignis","Baleno","Vitara","S-Cross","Jimny"],
+  "Hyundai": ["i10","i20","i20 N","i30","i30 N","Elantra N","Tucson","Kona","Kona N","Santa Fe","Ioniq 5","Ioniq 6"],
+  "Kia": ["Picanto","Picanto GT-Line","Rio","Ceed","Proceed","Stonic","Sportage","Sorento","Niro","EV6","EV6 GT"],
+  "Volvo": ["S60","S60 Polestar","V60","V60 Polestar","S90","V90","XC40","XC60","XC90","EX30","EX90"],
+  "Jaguar": ["XE","XF","XJ","E-Pace","F-Pace","I-Pace","F-Type"],
+  "Land Rover": ["Defender","Discovery Sport","Discovery","Range Rover Evoque","Range Rover Velar","Range Rover Sport","Range Rover"],
+  "MINI": ["3 Door","5 Door","Clubman","Countryman","Convertible","Cooper S","JCW","Electric"],
+  "Porsche": ["718 Cayman","718 Boxster","718 GT4","911 Carrera","911 Turbo","911 GT3","Taycan","Panamera","Macan","Cayenne"],
+  "Tesla": ["Model 3","Model Y","Model S","Model X"],
+  "Smart": ["fortwo","forfour","#1"],
+  "Mitsubishi": ["Space Star","ASX","Eclipse Cross","Outlander","L200"],
+  "Jeep": ["Renegade","Compass","Cherokee","Grand Cherokee","Wrangler"]
+};
+const OTHER_MAKE = "Inna marka…";
+const OTHER_MODEL = "Inny model…";
+
+// CAR_DATA jest stałe, więc listy <option> budujemy raz jako
+// DocumentFragmenty — zmiana marki to pojedynczy cloneNode zamiast
+// pętli createElement/appendChild
+function optionFrag(items, defText, otherText) {
+  const frag = document.createDocumentFragment();
+  const def = document.createElement('option'); def.value = ''; def.textContent = defText; frag.appendChild(def);
+  items.forEach(v => { const o = document.createElement('option'); o.value = v; o.textContent = v; frag.appendChild(o); });
+  const other = document.createElement('option'); other.value = otherText; other.textContent = otherText; frag.appendChild(other);
+  return frag;
+}
+const MODEL_FRAGMENTS = new Map();
+for (const make of Object.keys(CAR_DATA)) {
+  MODEL_FRAGMENTS.set(make, optionFrag(CAR_DATA[make], '— wybierz model —', OTHER_MODEL));
+}
+const EMPTY_MODEL_FRAGMENT = optionFrag([], '— wybierz model —', OTHER_MODEL);
+const MAKES_FRAGMENT = optionFrag(Object.keys(CAR_DATA).sort(), '— wybierz markę —', OTHER_MAKE);
+
+function populateMakes() {
+  const makeSel = $('makeSelect');
+  if (!makeSel) return;
+  makeSel.replaceChildren(MAKES_FRAGMENT.cloneNode(true));
+  onMakeChange();
+}
+function onMakeChange() {
+  const makeSel = $('makeSelect'), modelSel = $('modelSelect');
+  const makeCustomWrap = $('makeCustomWrap'), modelCustomWrap = $('modelCustomWrap');
+  const makeVal = makeSel.value;
+  makeCustomWrap.style.display = (makeVal === OTHER_MAKE) ? 'block' : 'none';
+  const frag = MODEL_FRAGMENTS.get(makeVal) || EMPTY_MODEL_FRAGMENT;
+  modelSel.replaceChildren(frag.cloneNode(true));
+  modelCustomWrap.style.display = 'none';
+}
+document.addEventListener('change', (ev) => {
+  if (ev.target && ev.target.id === 'modelSelect') {
+    $('modelCustomWrap').style.display = (ev.target.value === OTHER_MODEL) ? 'block' : 'none';
+  }
+});
+function getSelectedMakeModel() {
+  const makeSel = $('makeSelect'), modelSel = $('modelSelect');
+  const makeCustom = $('makeCustom'), modelCustom = $('modelCustom');
+  let make = '', model = '';
+  make = (makeSel.value === OTHER_MAKE) ? (makeCustom.value||'').trim() : (makeSel.value||'');
+  model = (modelSel.value === OTHER_MODEL) ? (modelCustom.value||'').trim() : (modelSel.value||'');
+  return { make, model };
+}
+function populateYears() {
+  const y = $('year'); if(!y) return;
+  // lista lat zmienia się raz do roku — budujemy HTML raz i pamiętamy
+  if (!populateYears._cached) {
+    const now = new Date().getFullYear();
+    const parts = ['<option value="">— wybierz rok —</option>'];
+    for(let yy=now; yy>=1980; yy--) parts.push('<option value="'+yy+'">'+yy+'</option>');
+    populateYears._cached = parts.join('');
+  }
+  y.innerHTML = populateYears._cached;
+}
+function enforcePlate(el){
+  // jedno przejście zamiast toUpperCase+replace (dwie kopie stringa);
+  // brak przypisania gdy nic się nie zmieniło = kursor nie skacze
+  const s = el.value || '';
+  let out = '';
+  for (let i = 0; i < s.length; i++) {
+    let c = s.charCodeAt(i);
+    if (c >= 97 && c <= 122) c -= 32;
+    if ((c >= 48 && c <= 57) || (c >= 65 && c <= 90)) out += String.fromCharCode(c);
+  }
+  if (out !== el.value) el.value = out;
+}
+
+// ====== Toast ======
+function toast(msg){ const t = $('toast'); t.textContent = msg || '✓ Zapisano'; t.style.display = 'block'; setTimeout(() => t.style.display = 'none', 1600); }
+
+// ====== Konto ======
+async function register(){
+  const email = $('regEmail').value || '', name = $('regName').value || '', pass = $('regPass').value || '';
+  if(!email || !name || !pass) return alert('Uzupełnij e-mail, imię i hasło.');
+  await api('/api/register', { method:'POST', json: { email, name, password: pass } });
+  toast('Konto utworzone. Zaloguj się.');
+}
+async function login(){
+  try {
+    const res = await api('/api/login', { method:'POST', json: { email: $('regEmail').value, password: $('regPass').value } });
+    currentUserName = res.user.name || '';
+    $('helloUser').textContent = currentUserName ? ('Cześć, ' + currentUserName) : 'Zalogowano';
+    $('authBtn').style.display='none'; $('logoutBtn').style.display='inline-block'; closeAuthModal();
+    window.loggedIn = true;
+    // najpierw selecty pojazdów (reszta czyta z nich vid), potem równolegle
+    await loadVehicles(); await loadReminderVehicles();
+    await Promise.all([refreshEntries(), scheduleStats(), loadReminders(), loadSchedules(), loadFuelLogs(), loadTrips()]);
+    populateYears();
+  } catch(e) { alert('Błędne dane logowania.'); }
+}
+async function logout(){ try{ await api('/api/logout',{method:'POST'}) }catch(e){} window.loggedIn=false; location.reload(); }
+
+// ====== Pojazdy ======
+// lista pojazdów zmienia się tylko przez add/delete — krótki cache
+// zdejmuje zdublowane fetch'e (login woła loadVehicles i
+// loadReminderVehicles niemal równocześnie)
+let _vehiclesCache = null, _vehiclesAt = 0;
+async function getVehicles(){
+  if (_vehiclesCache && Date.now() - _vehiclesAt < 30000) return _vehiclesCache;
+  _vehiclesCache = await api('/api/vehicles');
+  _vehiclesAt = Date.now();
+  return _vehiclesCache;
+}
+async function loadVehicles(){
+  const list = await getVehicles();
+  const sel = $('vehicleSelect'),
+        rsel = $('r_vehicle'),
+        ssel = $('s_vehicle'),
+        fsel = $('fuel_vehicle'),
+        tsel = $('trip_vehicle');
+  // opcje tworzymy raz w odłączonym fragmencie, pozostałe selecty
+  // dostają klon — 1×N createElement zamiast 5×N i jeden layout per select
+  const optFrag = document.createDocumentFragment();
+  list.forEach(v => {
+    const label = (v.make + ' ' + v.model + ' ' + (v.year||'') + (v.fuel?(' • '+v.fuel):'') + ' ' + (v.reg_plate||'')).trim();
+    const o = document.createElement('option'); o.value = v.id; o.textContent = label;
+    optFrag.appendChild(o);
+  });
+
+  sel.replaceChildren(optFrag.cloneNode(true));
+  const fillWithDefault = (select, defText) => {
+    if(!select) return;
+    const frag = optFrag.cloneNode(true);
+    const def = document.createElement('option'); def.value = ''; def.textContent = defText;
+    frag.insertBefore(def, frag.firstChild);
+    select.replaceChildren(frag);
+  };
+  fillWithDefault(rsel, '—');
+  fillWithDefault(ssel, '—');
+  fillWithDefault(fsel, '— wybierz —');
+  fillWithDefault(tsel, '— wybierz —');
+  if(list.length) {
+    sel.value = String(list[0].id);
+    if(fsel && !fsel.value) fsel.value = String(list[0].id);
+    if(tsel && !tsel.value) tsel.value = String(list[0].id);
+  }
+}
+async function addVehicle(){
+  const { make, model } = getSelectedMakeModel();
+  if (!make || !model) return alert('Wybierz markę i model (lub wpisz własne).');
+  const body = {
+    make, model,
+    year: parseInt($('year').value||0)||null,
+    fuel: $('fuel').value || null,
+    reg_plate: $('reg_plate').value
+  };
+  await api('/api/vehicles', { method:'POST', json: body });
+  _vehiclesCache = null;
+  toast('Dodano pojazd'); await loadVehicles();
+  await Promise.all([scheduleStats(), loadReminders(), loadSchedules(), loadFuelLogs(), loadTrips()]);
+}
+async function deleteSelectedVehicle(){
+  const sel = $('vehicleSelect'); if(!sel.value) return alert('Wybierz pojazd');
+  if(!confirm('Usunąć wybrany pojazd wraz z wpisami?')) return;
+  await api('/api/vehicles/' + sel.value, {method:'DELETE'});
+  _vehiclesCache = null;
+  refreshEntries._lastKey = null; loadFuelLogs._lastKey = null; loadTrips._lastKey = null;
+  toast('Usunięto pojazd'); await loadVehicles();
+  await Promise.all([scheduleStats(), loadReminders(), refreshEntries(), loadSchedules(), loadFuelLogs(), loadTrips()]);
+}
+
+// ====== Wpisy ======
+let editEntryId = null;
+async function addEntry(){
+  const sel = $('vehicleSelect'); if(!sel.value) return alert('Najpierw dodaj pojazd.');
+  const fd = new FormData();
+  fd.append('vehicle_id', sel.value);
+  fd.append('date', $('date').value);
+  fd.append('mileage', $('mileage').value);
+  fd.append('service_type', $('service_type').value);
+  fd.append('description', $('description').value);
+  fd.append('cost', $('cost').value);
+  const f = $('file').files[0]; if (f) fd.append('file', f);
+  if(editEntryId){
+    const body = { date:$('date').value, mileage:$('mileage').value, service_type:$('service_type').value, description:$('description').value, cost:$('cost').value };
+    await api('/api/entries/' + editEntryId, { method:'PUT', json: body });
+    editEntryId = null;
+    document.querySelector('button.primary').textContent = 'Dodaj wpis';
+  } else {
+    await api('/api/entries', { method:'POST', body: fd });
+    $('file').value = '';
+  }
+  refreshEntries._lastKey = null;
+  toast('Zapisano'); await refreshEntries();
+}
+function editEntry(id){
+  const e = window._entriesById.get(String(id)); if(!e) return;
+  editEntryId = id;
+  $('date').value = onlyDate(e.date) || '';
+  $('mileage').value = e.mileage || '';
+  $('service_type').value = e.service_type || ''; $('description').value = e.description || ''; $('cost').value = e.cost || '';
+  document.querySelector('button.primary').textContent = 'Zapisz zmiany';
+  window.scrollTo({ top: 0, behavior: 'smooth' });
+}
+const searchChanged = debounce(() => refreshEntries(), 300);
+async function delEntry(id){ if(!confirm('Usunąć wpis?')) return; await api('/api/entries/' + id, {method:'DELETE'}); toast('Usunięto'); refreshEntries._lastKey = null; refreshEntries(); }
+async function refreshEntries(){
+  const sel = $('vehicleSelect'); 
+  const currentVehicleId = sel.value || null;
+  const q = $('search').value || '';
+  const params = new URLSearchParams();
+  if(currentVehicleId) params.set('vehicle_id', currentVehicleId);
+  if(q) params.set('q', q);
+
+  // ten sam filtr → użyj poprzedniej odpowiedzi zamiast round-tripu;
+  // mutacje czyszczą _lastKey
+  const cacheKey = (currentVehicleId||'') + '|' + q;
+  let list = [];
+  if (refreshEntries._lastKey === cacheKey && refreshEntries._lastList) {
+    list = refreshEntries._lastList;
+  } else {
+    try {
+      list = await api('/api/entries?' + params.toString());
+    } catch(e){
+      return;
+    }
+    refreshEntries._lastKey = cacheKey;
+    refreshEntries._lastList = list;
+  }
+
+  window._entriesCache = list;
+  // O(1) lookup dla editEntry zamiast find po całej liście
+  window._entriesById = new Map();
+  list.forEach(e => window._entriesById.set(String(e.id), e));
+  const tb = $('entriesTbody');
+
+  // jeden zapis innerHTML zamiast appendChild per wiersz —
+  // 1 przeliczenie layoutu zamiast N
+  const parts = [];
+  list.forEach(e => {
+    const formattedDate = formatDatePl(e.date);
+    const mileageFormatted = (e.mileage != null)
+      ? FMT_INT.format(e.mileage)
+      : (e.mileage || '');
+
+    // fragmenty idą do wspólnej tablicy — jeden płaski string po join,
+    // bez łańcucha konkatenacji per wiersz
+    parts.push(
+      '<tr><td>', formattedDate,
+      '</td><td>', mileageFormatted,
+      '</td><td>', escapeHtml(e.service_type),
+      '</td><td>', escapeHtml(e.description || ''),
+      '</td><td>', FMT_MONEY.format(Number(e.cost||0)),
+      '</td><td>', (e.attachment ? ('<a target=_blank href="/uploads/' + encodeURIComponent(e.attachment) + '">plik</a>') : ''),
+      '</td><td class="actions">',
+      '<button type="button" data-action="edit" data-id="', e.id, '">Edytuj</button> ',
+      '<button type="button" data-action="del" data-id="', e.id, '">Usuń</button>',
+      '</td></tr>');
+  });
+  // zapis DOM na granicy klatki — przeglądarka wciśnie paint
+  // (toast/spinner) przed podmianą dużej tabeli; seria wywołań
+  // zostawia tylko ostatnią klatkę
+  const html = parts.join('');
+  if (refreshEntries._raf) cancelAnimationFrame(refreshEntries._raf);
+  refreshEntries._raf = requestAnimationFrame(() => {
+    refreshEntries._raf = null;
+    tb.innerHTML = html;
+  });
+
+  await scheduleStats();
+}
+
+// ====== Tankowania (frontend) ======
+async function loadFuelLogs(){
+  const sel = $('fuel_vehicle');
+  if(!sel) return;
+  const vid = sel.value || '';
+  const params = new URLSearchParams();
+  if(vid) params.set('vehicle_id', vid);
+  let list = [];
+  if (loadFuelLogs._lastKey === vid && loadFuelLogs._lastList) {
+    list = loadFuelLogs._lastList;
+  } else {
+    try { list = await api('/api/fuel_logs?' + params.toString()); } catch(e){ return; }
+    loadFuelLogs._lastKey = vid;
+    loadFuelLogs._lastList = list;
+  }
+  const tb = $('fuelTbody'); if(!tb) return;
+  const parts = [];
+  list.forEach(f => {
+    parts.push(
+      '<tr><td>', formatDatePl(f.date),
+      '</td><td>', escapeHtml(f.station || ''),
+      '</td><td>', (f.liters != null ? FMT_MONEY.format(Number(f.liters)) : ''),
+      '</td><td>', (f.price_per_liter != null ? FMT_MONEY.format(Number(f.price_per_liter)) : ''),
+      '</td><td>', (f.total_cost != null ? FMT_MONEY.format(Number(f.total_cost)) : ''),
+      '</td><td>', (f.odometer != null ? FMT_INT.format(Number(f.odometer)) : ''),
+      '</td><td>', (f.full_tank ? 'tak' : 'nie'),
+      '</td><td class="actions"><button type="button" data-action="del" data-id="', f.id, '">Usuń</button></td></tr>');
+  });
+  tb.innerHTML = parts.join('');
+}
+async function addFuelLog(){
+  const vid = $('fuel_vehicle').value;
+  if(!vid) return alert('Wybierz pojazd dla tankowania.');
+  const body = {
+    vehicle_id: vid,
+    date: $('fuel_date').value || null,
+    station: $('fuel_station').value || null,
+    liters: $('fuel_liters').value || null,
+    price_per_liter: $('fuel_price').value || null,
+    odometer: $('fuel_odometer').value || null,
+    full_tank: $('fuel_full').checked
+  };
+  await api('/api/fuel_logs', { method:'POST', json: body });
+  toast('Zapisano tankowanie');
+  loadFuelLogs._lastKey = null;
+  $('fuel_station').value=''; $('fuel_liters').value=''; $('fuel_price').value=''; $('fuel_odometer').value=''; $('fuel_full').checked=true;
+  await loadFuelLogs(); await scheduleStats();
+}
+async function deleteFuelLog(id){
+  if(!confirm('Usunąć wpis tankowania?')) return;
+  await api('/api/fuel_logs/' + id, { method:'DELETE' });
+  toast('Usunięto tankowanie');
+  loadFuelLogs._lastKey = null;
+  await loadFuelLogs(); await scheduleStats();
+}
+
+// ====== Trasy (frontend) ======
+async function loadTrips(){
+  const sel = $('trip_vehicle');
+  if(!sel) return;
+  const vid = sel.value || '';
+  const params = new URLSearchParams();
+  if(vid) params.set('vehicle_id', vid);
+  let list = [];
+  if (loadTrips._lastKey === vid && loadTrips._lastList) {
+    list = loadTrips._lastList;
+  } else {
+    try { list = await api('/api/trips?' + params.toString()); } catch(e){ return; }
+    loadTrips._lastKey = vid;
+    loadTrips._lastList = list;
+  }
+  const tb = $('tripTbody'); if(!tb) return;
+  const parts = [];
+  list.forEach(t => {
+    const dateStr = formatDatePl(t.start_date) + (t.end_date ? ' - ' + formatDatePl(t.end_date) : '');
+    const route = escapeHtml((t.start_location || '') + (t.end_location ? ' → ' + t.end_location : ''));
+    const dist = (t.distance_km != null ? FMT_DIST.format(Number(t.distance_km)) : '');
+    const timeRange = (formatTimeHm(t.start_time) || '') + (t.end_time ? ('–' + formatTimeHm(t.end_time)) : '');
+    const avg = (t.avg_consumption != null ? FMT_ONE.format(Number(t.avg_consumption)) : '');
+    const status = t.planned ? 'planowana' : 'zrealizowana';
+    parts.push(
+      '<tr><td>', dateStr,
+      '</td><td>', route,
+      '</td><td>', dist,
+      '</td><td>', timeRange,
+      '</td><td>', avg,
+      '</td><td>', status,
+      '</td><td class="actions"><button type="button" data-action="del" data-id="', t.id, '">Usuń</button></td></tr>');
+  });
+  tb.innerHTML = parts.join('');
+}
+async function addTrip(){
+  const vid = $('trip_vehicle').value;
+  if(!vid) return alert('Wybierz pojazd dla trasy.');
+  const body = {
+    vehicle_id: vid,
+    start_date: $('trip_start_date').value || null,
+    end_date: $('trip_end_date').value || null,
+    start_time: $('trip_start_time').value || null,
+    end_time: $('trip_end_time').value || null,
+    start_location: $('trip_start_loc').value || null,
+    end_location: $('trip_end_loc').value || null,
+    distance_km: $('trip_distance').value || null,
+    avg_consumption: $('trip_avg_consumption').value || null,
+    planned: $('trip_planned').checked,
+    notes: $('trip_notes').value || null
+  };
+  await api('/api/trips', { method:'POST', json: body });
+  toast('Zapisano trasę');
+  loadTrips._lastKey = null;
+  $('trip_start_date').value=''; $('trip_end_date').value='';
+  $('trip_start_time').value=''; $('trip_end_time').value='';
+  $('trip_start_loc').value=''; $('trip_end_loc').value='';
+  $('trip_distance').value=''; $('trip_avg_consumption').value=''; $('trip_planned').checked=false; $('trip_notes').value='';
+  await loadTrips();
+}
+async function deleteTrip(id){
+  if(!confirm('Usunąć trasę?')) return;
+  await api('/api/trips/' + id, { method:'DELETE' });
+  toast('Usunięto trasę');
+  loadTrips._lastKey = null;
+  await loadTrips();
+}
+
+// ====== Delegacja akcji wierszy ======
+// jeden listener na tabelę zamiast inline onclick per wiersz —
+// mniejszy HTML do parsowania i zero globalnych handlerów
+function bindRowActions(){
+  const entries = $('entriesTbody');
+  if(entries) entries.addEventListener('click', ev => {
+    const b = ev.target.closest('button[data-action]');
+    if(!b) return;
+    if(b.dataset.action === 'edit') editEntry(b.dataset.id);
+    else if(b.dataset.action === 'del') delEntry(b.dataset.id);
+  });
+  const fuel = $('fuelTbody');
+  if(fuel) fuel.addEventListener('click', ev => {
+    const b = ev.target.closest('button[data-action]');
+    if(b && b.dataset.action === 'del') deleteFuelLog(b.dataset.id);
+  });
+  const trips = $('tripTbody');
+  if(trips) trips.addEventListener('click', ev => {
+    const b = ev.target.closest('button[data-action]');
+    if(b && b.dataset.action === 'del') deleteTrip(b.dataset.id);
+  });
+  const rc = $('r_type_custom');
+  // zapis tylko przy realnej zmianie — przypisanie input.value przestawia
+  // kursor na koniec, nawet gdy string jest identyczny
+  if(rc) rc.addEventListener('input', debounce(() => {
+    const v = rc.value.trimStart();
+    if (v !== rc.value) rc.value = v;
+  }));
+  const rem = $('r_tbody');
+  if(rem) rem.addEventListener('click', ev => {
+    const b = ev.target.closest('button[data-action]');
+    if(!b) return;
+    if(b.dataset.action === 'complete') completeReminder(b.dataset.id);
+    else if(b.dataset.action === 'del') deleteReminder(b.dataset.id);
+  });
+  const sch = $('s_tbody');
+  if(sch) sch.addEventListener('click', ev => {
+    const b = ev.target.closest('button[data-action]');
+    if(b && b.dataset.action === 'del') deleteSchedule(b.dataset.id);
+  });
+}
+
+// ====== Statystyki ======
+const BarValueLabels = {
+  id: 'barValueLabels',
+  afterDatasetsDraw(chart) {
+    const {ctx} = chart;
+    ctx.save();
+    const ds = chart.getDatasetMeta(0);
+    ds.data.forEach((bar, i) => {
+      const val = chart.data.datasets[0].data[i];
+      if (val == null) return;
+      const label = FMT_MONEY.format(Number(val));
+      ctx.font = '12px system-ui, -apple-system, Segoe UI, Roboto, Arial';
+      ctx.fillStyle = '#f3f4f6';
+      ctx.textAlign = 'center';
+      ctx.fillText(label, bar.x, bar.y - 6);
+    });
+    ctx.restore();
+  }
+};
+
+// opcje wykresu są stałe — budujemy literał raz, a loadStats tylko
+// podmienia dane istniejącej instancji zamiast destroy+new Chart
+const CHART_COST_OPTS = {
+  responsive:true,
+  interaction:{ mode:'index', intersect:false },
+  scales:{
+    x:{ grid:{color:'#222'}, ticks:{color:'#f3f4f6', maxRotation:0, autoSkip:true} },
+    y:{ grid:{color:'#222'}, ticks:{color:'#f3f4f6'} }
+  },
+  plugins:{
+    legend:{ labels:{ color:'#f3f4f6' } },
+    tooltip:{ callbacks:{ label:(c)=> ' ' + FMT_MONEY.format(Number(c.raw||0)) + ' PLN' } }
+  }
+};
+
+// seria mutacji (np. dodanie wpisu + odświeżenie tabeli) zamawia
+// statystyki wielokrotnie — koalescencja w jeden fetch per ~50 ms
+let _statsPending = null;
+function scheduleStats(){
+  if (_statsPending) return _statsPending;
+  _statsPending = new Promise(res => setTimeout(async () => {
+    _statsPending = null;
+    await loadStats();
+    res();
+  }, 50));
+  return _statsPending;
+}
+
+async function loadStats(){
+  try{
+    const s = await api('/api/stats');
+    window._dailyVehicleCosts = s.daily_vehicle_costs || [];
+
+    // kubełkujemy raz po fetchu — każdy kolejny render porównuje
+    // prefiksy stringów 'YYYY-MM' zamiast parsować Date per wiersz
+    window._dvcByMonth = new Map();
+    window._dvcTotalByDate = new Map();
+    for (const row of window._dailyVehicleCosts) {
+      const ymd = row.ymd || '';
+      if (ymd.length < 10) continue;
+      const mk = ymd.slice(0,7);
+      let m = window._dvcByMonth.get(mk);
+      if (!m) { m = new Map(); window._dvcByMonth.set(mk, m); }
+      let rows = m.get(ymd);
+      if (!rows) { rows = []; m.set(ymd, rows); }
+      rows.push(row);
+      // suma dzienna liczona tu, żeby render nie robił reduce per dzień
+      window._dvcTotalByDate.set(ymd, (window._dvcTotalByDate.get(ymd) || 0) + Number(row.total_cost || 0));
+    }
+
+    const range = parseInt(($('dash_range')?.value || '0'), 10);
+    let cutoffYmd = null;
+    if (range > 0) {
+      const c = new Date();
+      c.setHours(0,0,0,0);
+      c.setDate(c.getDate() - range + 1);
+      cutoffYmd = c.getFullYear() + '-' + pad2(c.getMonth()+1) + '-' + pad2(c.getDate());
+    }
+
+    // Mapy zamiast obiektów — klucze numeryczne/mieszane wpędzają
+    // obiekt w dictionary mode, a Map jest szybsza przy insert+iterate
+    const sumsByVehicle = new Map();
+    const labelsByVehicle = new Map();
+    (window._dailyVehicleCosts || []).forEach(row => {
+      // ymd jest ISO, więc porównanie leksykograficzne == chronologiczne
+      if (cutoffYmd && (!row.ymd || row.ymd < cutoffYmd)) return;
+      const vid = row.vehicle_id;
+      const label = row.label || ('Pojazd #' + vid);
+      labelsByVehicle.set(vid, label);
+      sumsByVehicle.set(vid, (sumsByVehicle.get(vid) || 0) + Number(row.total_cost || 0));
+    });
+
+    const vehicleIds = [...labelsByVehicle.keys()].sort((a,b) => {
+      return (labelsByVehicle.get(a)||'').localeCompare(labelsByVehicle.get(b)||'', 'pl');
+    });
+
+    // kolor per pojazd liczymy raz na przebieg — ten sam vid trafia
+    // do wykresu, tabeli sum, przebiegów i spalania
+    const colorByVid = new Map();
+    vehicleIds.forEach(vid => colorByVid.set(vid, getVehicleColor(vid)));
+    (s.last_mileage||[]).forEach(r => {
+      if(!colorByVid.has(r.vehicle_id)) colorByVid.set(r.vehicle_id, getVehicleColor(r.vehicle_id));
+    });
+    (s.fuel_stats||[]).forEach(r => {
+      if(!colorByVid.has(r.vehicle_id)) colorByVid.set(r.vehicle_id, getVehicleColor(r.vehicle_id));
+    });
+
+    // ====== Wykres: koszt wg pojazdu (kolory per pojazd) ======
+    const ctx = $('chartCost')?.getContext('2d');
+    if (ctx) {
+      const labels = vehicleIds.map(vid => labelsByVehicle.get(vid) || ('Pojazd #' + vid));
+      const dataVals = vehicleIds.map(vid => sumsByVehicle.get(vid) || 0);
+      const colors = vehicleIds.map(vid => colorByVid.get(vid));
+
+      if (window._chartCost) {
+        const ds = window._chartCost.data.datasets[0];
+        window._chartCost.data.labels = labels;
+        ds.data = dataVals;
+        ds.backgroundColor = colors;
+        ds.borderColor = colors;
+        window._chartCost.update('none');
+      } else {
+        window._chartCost = new Chart(ctx, {
+          type:'bar',
+          data:{
+            labels,
+            datasets:[{
+              label:'Koszt (PLN) / pojazd',
+              data:dataVals,
+              backgroundColor:colors,
+              borderColor:colors,
+              borderWidth:1
+            }]
+          },
+          options: CHART_COST_OPTS,
+          plugins:[BarValueLabels]
+        });
+      }
+    }
+
+    // ====== Tabela suma kosztów per pojazd (z kolorami) ======
+    const tBody = $('sumByVehicleTbody');
+    let grand = 0;
+    const sumParts = [];
+    vehicleIds.forEach(vid => {
+      const sum = sumsByVehicle.get(vid) || 0;
+      grand += sum;
+      const color = colorByVid.get(vid);
+      sumParts.push(
+        '<tr style="border-left:4px solid ', color, '"><td>',
+        escapeHtml(labelsByVehicle.get(vid)||('Pojazd #'+vid)), '</td><td>',
+        FMT_MONEY.format(sum), '</td></tr>');
+    });
+    tBody.innerHTML = sumParts.join('');
+    $('sumAll').textContent = FMT_MONEY.format(grand);
+
+    // ====== Tabela ostatnich przebiegów (również z kolorami) ======
+    const tb = $('mileageTbody'); if(tb){
+      const mileParts = [];
+      (s.last_mileage||[]).forEach(r => {
+        const color = colorByVid.get(r.vehicle_id);
+        mileParts.push(
+          '<tr style="border-left:4px solid ', color, '"><td>',
+          escapeHtml(r.label||'-'), '</td><td>', FMT_INT.format(Number(r.mileage||0)), '</td></tr>');
+      });
+      tb.innerHTML = mileParts.join('');
+    }
+
+    // ====== Średnie spalanie (fuel_stats) ======
+    const fsBody = $('fuelSummaryTbody');
+    if(fsBody){
+      const fsParts = [];
+      (s.fuel_stats || []).forEach(row => {
+        const color = colorByVid.get(row.vehicle_id);
+        const avg = row.avg_l_100km != null
+          ? FMT_ONE.format(Number(row.avg_l_100km))
+          : '-';
+        const dist = row.distance_km != null
+          ? FMT_INT0.format(Number(row.distance_km))
+          : '-';
+        const liters = FMT_ONE.format(Number(row.total_liters || 0));
+        fsParts.push(
+          '<tr style="border-left:4px solid ', color, '"><td>',
+          escapeHtml(row.label || '-'), '</td><td>', liters, '</td><td>', dist,
+          '</td><td>', avg, '</td></tr>');
+      });
+      fsBody.innerHTML = fsParts.join('');
+    }
+
+    // ====== Kalendarz kosztów (osobna karta) ======
+    const monthInput = $('cal_month');
+    if (monthInput && !monthInput.value) {
+      const now = new Date();
+      monthInput.value = now.toISOString().slice(0,7);
+    }
+    renderCostCalendar();
+
+  }catch(e){ console.error(e); }
+}
+
+function renderCostCalendar(){
+  const grid = $('calendarGrid');
+  if(!grid) return;
+  if (!window._dvcByMonth || !window._dvcByMonth.size) { grid.innerHTML = ''; return; }
+
+  const monthInput = $('cal_month');
+  let year, month;
+  if (monthInput && monthInput.value) {
+    const parts = monthInput.value.split('-');
+    year = parseInt(parts[0],10);
+    month = parseInt(parts[1],10);
+  } else {
+    const now = new Date();
+    year = now.getFullYear();
+    month = now.getMonth() + 1;
+    if (monthInput) monthInput.value = now.toISOString().slice(0,7);
+  }
+
+  const daysInMonth = new Date(year, month, 0).getDate();
+  const firstDay = new Date(year, month-1, 1);
+  // JS: 0=niedziela, my chcemy 0=poniedziałek
+  let offset = (firstDay.getDay() + 6) % 7;
+
+  // wiersze bieżącego miesiąca mamy już pokubełkowane przy fetchu
+  const byDate = window._dvcByMonth.get(year + '-' + pad2(month)) || new Map();
+
+  // cała siatka jako jeden string → jeden parse+layout zamiast
+  // setek appendChildów; popupy obsługuje delegacja na gridzie
+  const parts = [];
+  for(let i=0;i<offset;i++) parts.push('<div class="calendar-cell"></div>');
+
+  for(let day=1; day<=daysInMonth; day++){
+    const ymd = year + '-' + pad2(month) + '-' + pad2(day);
+    const rows = byDate.get(ymd) || [];
+    const totalForDay = window._dvcTotalByDate.get(ymd) || 0;
+    parts.push('<div class="calendar-cell"><div class="day-num">', day, '</div>');
+
+    if (totalForDay > 0) {
+      parts.push('<div class="cost-total">Razem: ', FMT_MONEY.format(totalForDay), ' zł</div>');
+
+      for (const r of rows) {
+        const service = Number(r.service_cost || 0);
+        const fuel = Number(r.fuel_cost || 0);
+        let details = '';
+        if (service > 0) details += 'serwis ' + FMT_MAX2.format(service) + ' zł';
+        if (fuel > 0) {
+          if (details) details += ', ';
+          details += 'paliwo ' + FMT_MAX2.format(fuel) + ' zł';
+        }
+        const label = escapeHtml(r.label || '-');
+        const color = getVehicleColor(r.vehicle_id);
+        parts.push(
+          '<div class="entry" style="border-left:3px solid ', color, ';padding-left:6px"',
+          ' data-label="', label, '" data-ymd="', ymd,
+          '" data-service="', service, '" data-fuel="', fuel,
+          '" data-total="', Number(r.total_cost || (service + fuel)),
+          '">• ', label, ' — ', details, '</div>');
+      }
+    }
+    parts.push('</div>');
+  }
+  const html = parts.join('');
+  if (renderCostCalendar._raf) cancelAnimationFrame(renderCostCalendar._raf);
+  renderCostCalendar._raf = requestAnimationFrame(() => {
+    renderCostCalendar._raf = null;
+    grid.innerHTML = html;
+  });
+  bindCalendarPopups(grid);
+}
+
+function bindCalendarPopups(grid){
+  if (grid._popupsBound) return;
+  grid._popupsBound = true;
+  // odczyt layoutu (getBoundingClientRect) przed doklejeniem popupu —
+  // pomiar po appendChild wymuszałby synchroniczny reflow z nowym węzłem
+  grid.addEventListener('mouseover', ev => {
+    const entry = ev.target.closest('.entry');
+    if (!entry || entry._popup) return;
+    const rect = entry.getBoundingClientRect();
+    const popup = document.createElement('div');
+    popup.className = 'calendar-popup';
+    popup.innerHTML =
+      '<strong>' + escapeHtml(entry.dataset.label || '-') + '</strong><br>' +
+      'Data: ' + formatDatePl(entry.dataset.ymd) + '<br>' +
+      'Serwis: ' + FMT_MONEY.format(Number(entry.dataset.service || 0)) + ' zł<br>' +
+      'Paliwo: ' + FMT_MONEY.format(Number(entry.dataset.fuel || 0)) + ' zł<br>' +
+      'Razem: ' + FMT_MONEY.format(Number(entry.dataset.total || 0)) + ' zł';
+    popup.style.top = (rect.bottom + 4) + 'px';
+    popup.style.left = rect.left + 'px';
+    document.body.appendChild(popup);
+    entry._popup = popup;
+  }, { passive: true });
+  grid.addEventListener('mouseout', ev => {
+    const entry = ev.target.closest('.entry');
+    if (!entry || !entry._popup) return;
+    if (entry.contains(ev.relatedTarget)) return;
+    entry._popup.remove();
+    entry._popup = null;
+  }, { passive: true });
+}
+
+// ====== Przypomnienia ======
+// szybkie serie klików (zakończ/usuń kilka pozycji) zamawiają
+// odświeżenie wielokrotnie — unieważnienia zbieramy do jednego
+// przebiegu na najbliższej klatce
+const _pendingRefresh = new Set();
+function invalidate(key){
+  _pendingRefresh.add(key);
+  if (_pendingRefresh.size === 1) requestAnimationFrame(flushRefresh);
+}
+async function flushRefresh(){
+  const keys = [..._pendingRefresh];
+  _pendingRefresh.clear();
+  if (keys.includes('reminders')) await loadReminders();
+  if (keys.includes('schedules')) await loadSchedules();
+}
+
+// nakładające się odświeżenia anulujemy — spóźniona odpowiedź
+// nadpisałaby świeższy render (api() przekazuje signal do fetch)
+let _remCtl = null;
+// flaga "w locie": wywołanie w trakcie ładowania przerywa wiszący fetch
+// i zamawia jeden dodatkowy przebieg po zakończeniu, zamiast startować
+// drugiego równolegle
+let _remBusy = false, _remAgain = false;
+async function loadReminders(){
+  if (_remBusy) { _remAgain = true; _remCtl?.abort(); return; }
+  _remBusy = true;
+  try{
+    _remCtl = new AbortController();
+    const list = await api('/api/reminders', { signal: _remCtl.signal });
+    const tb = $('r_tbody'); if(!tb) return;
+    // serwer wysyła listę posortowaną i z gotowymi polami
+    // (due_icon / due_display / notify_text) — tu zostaje tylko
+    // jednorazowy escape tytułu (treść od użytkownika)
+    list.forEach(r => {
+      if (r._title === undefined) r._title = escapeHtml(r.title);
+    });
+    // cała tabela jako jeden string → jeden parse zamiast N wywołań
+    // parsera per tr.innerHTML; akcje obsługuje delegacja na tbody.
+    // wiersz to jeden template literal — silnik skleja go w jedną
+    // alokację, bez stosu pośrednich stringów per komórka
+    const parts = list.map(r =>
+      `<tr><td>${r.due_icon}</td><td>${r._title}</td><td>${r.due_display}</td><td>${r.due_mileage||''}</td><td>${r.notify_text}</td><td>${r.notify_before_days ?? ''}</td><td>${r.vehicle_id || ''}</td><td class="actions"><button type="button" data-action="complete" data-id="${r.id}">Zakończ</button> <button type="button" data-action="del" data-id="${r.id}">Usuń</button></td></tr>`);
+    tb.innerHTML = parts.join('');
+  }catch(e){}
+  finally {
+    _remBusy = false;
+    if (_remAgain) { _remAgain = false; loadReminders(); }
+  }
+}
+async function loadReminderVehicles(){
+  try{
+    const list = await getVehicles(); const rsel = $('r_vehicle'); if(!rsel) return;
+    const frag = document.createDocumentFragment();
+    const def = document.createElement('option'); def.value = ''; def.textContent = '—'; frag.appendChild(def);
+    list.forEach(v => { const o = document.createElement('option'); o.value = v.id; o.textContent = (v.make+' '+v.model+' '+(v.year||'')+' '+(v.reg_plate||'')).trim(); frag.appendChild(o); });
+    rsel.replaceChildren(frag);
+  }catch(e){}
+}
+// wypełnia tylko s_vehicle — otwarcie modala harmonogramów nie może
+// przebudowywać pozostałych selectów ani resetować wyboru na dashboardzie
+async function loadScheduleVehicles(){
+  try{
+    const list = await getVehicles(); const ssel = $('s_vehicle'); if(!ssel) return;
+    const frag = document.createDocumentFragment();
+    const def = document.createElement('option'); def.value = ''; def.textContent = '—'; frag.appendChild(def);
+    list.forEach(v => { const o = document.createElement('option'); o.value = v.id; o.textContent = (v.make+' '+v.model+' '+(v.year||'')+' '+(v.reg_plate||'')).trim(); frag.appendChild(o); });
+    ssel.replaceChildren(frag);
+  }catch(e){}
+}
+// number|null zamiast string|number|null — stabilny typ pola
+// to stabilne inline cache w silniku i czystszy JSON dla API
+const toInt = v => { const n = parseInt(v, 10); return Number.isFinite(n) ? n : null; };
+
+// pola formularzy przypomnień/harmonogramów rozwiązujemy raz,
+// przy pierwszym użyciu — formularze są statyczne w INDEX_HTML
+let _remFields = null;
+function fields(){
+  return _remFields ||= {
+    rType: $('r_type'), rCustom: $('r_type_custom'), rCustomWrap: $('r_type_custom_wrap'),
+    rDate: $('r_date'), rMileage: $('r_mileage'), rVehicle: $('r_vehicle'),
+    rNotifyMail: $('r_notify_mail'), rNotifyDays: $('r_notify_days'),
+    sVehicle: $('s_vehicle'), sKind: $('s_kind'),
+    sIntervalM: $('s_interval_m'), sIntervalKm: $('s_interval_km'),
+    sLastDate: $('s_last_date'), sLastMil: $('s_last_mil')
+  };
+}
+async function addReminder(){
+  const f = fields();
+  const typeVal = f.rType && f.rType.value === 'Inne' ? (f.rCustom.value||'').trim() : (f.rType ? f.rType.value : '');
+  if(!typeVal) return alert('Wybierz rodzaj lub wpisz własny powód.');
+  const body = {
+    title: typeVal,
+    due_date: f.rDate.value || null,
+    due_mileage: toInt(f.rMileage.value),
+    vehicle_id: f.rVehicle.value || null,
+    notify_email: f.rNotifyMail.checked,
+    notify_before_days: toInt(f.rNotifyDays.value) ?? 7
+  };
+  await api('/api/reminders', { method:'POST', json: body });
+  toast('Dodano przypomnienie'); f.rType.value='Przegląd techniczny'; if(f.rCustom) f.rCustom.value='';
+  f.rDate.value=''; f.rMileage.value=''; f.rCustomWrap.style.display='none'; f.rNotifyMail.checked=false; f.rNotifyDays.value='';
+  invalidate('reminders');
+}
+async function completeReminder(id){ await api('/api/reminders/' + id, { method:'PUT', json: { completed_at: new Date().toISOString() } }); invalidate('reminders'); }
+async function deleteReminder(id){ await api('/api/reminders/' + id, { method:'DELETE' }); invalidate('reminders'); }
+
+// ====== Harmonogramy ======
+let _schCtl = null;
+let _schBusy = false, _schAgain = false;
+async function loadSchedules(){
+  const tb = $('s_tbody'); if(!tb) return;
+  if (_schBusy) { _schAgain = true; _schCtl?.abort(); return; }
+  _schBusy = true;
+  _schCtl = new AbortController();
+  let list;
+  try { list = await api('/api/schedules', { signal: _schCtl.signal }); }
+  catch(e){ if (e.name === 'AbortError') return; throw e; }
+  finally {
+    _schBusy = false;
+    if (_schAgain) { _schAgain = false; loadSchedules(); }
+  }
+  const parts = list.map(s => {
+    const inter = [(s.interval_months? (s.interval_months+' mies.'):'') , (s.interval_km? (s.interval_km+' km'):'')].filter(Boolean).join(' / ') || '-';
+    const next = (s.next_due_date ? formatDatePl(s.next_due_date) : (s.next_due_mileage || '-'));
+    return `<tr><td>${escapeHtml(s.kind)}</td><td>${inter}</td><td>${next}</td><td>${s.vehicle_id||''}</td><td class="actions"><button type="button" data-action="del" data-id="${s.id}">Usuń</button></td></tr>`;
+  });
+  tb.innerHTML = parts.join('');
+}
+async function addSchedule(){
+  const f = fields();
+  const body = {
+    vehicle_id: f.sVehicle.value || null,
+    kind: f.sKind.value || 'Serwis okresowy',
+    interval_months: toInt(f.sIntervalM.value),
+    interval_km: toInt(f.sIntervalKm.value),
+    last_service_date: f.sLastDate.value || null,
+    last_service_mileage: toInt(f.sLastMil.value)
+  };
+  await api('/api/schedules', { method:'POST', json: body });
+  toast('Dodano harmonogram'); f.sKind.value=''; f.sIntervalM.value=''; f.sIntervalKm.value=''; f.sLastDate.value=''; f.sLastMil.value='';
+  invalidate('schedules');
+}
+async function deleteSchedule(id){ await api('/api/schedules/' + id, { method:'DELETE' }); invalidate('schedules'); }
+
+// ====== Init ======
+document.addEventListener('DOMContentLoaded', () => {
+  bindRowActions();
+  // selecty marek/lat nie blokują pierwszego paint — wypełniamy je,
+  // gdy główny wątek ma chwilę wolnego
+  const idle = window.requestIdleCallback || (fn => setTimeout(fn, 0));
+  idle(() => { populateMakes(); populateYears(); });
+});
+
+Object.assign(window, {
+  openAuthModal, closeAuthModal, openReminders, closeReminders, openSchedules, closeSchedules, backdropClose,
+  register, login, logout,
+  loadVehicles, addVehicle, deleteSelectedVehicle,
+  addEntry, refreshEntries, searchChanged,
+  loadStats, loadReminders, loadReminderVehicles, loadScheduleVehicles,
+  addReminder,
+  loadSchedules, addSchedule,
+  onMakeChange, enforcePlate,
+  loadFuelLogs, addFuelLog,
+  loadTrips, addTrip,
+  renderCostCalendar
+});